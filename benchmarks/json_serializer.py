@@ -0,0 +1,89 @@
+"""Compare the JSON backends used by ``Response`` and measure the memory used
+to serialize a large list with and without streaming.
+
+Usage::
+
+    python benchmarks/json_serializer.py
+
+The standard library ``json`` module is always measured. ``orjson`` and
+``ujson`` are measured when they are installed.
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from microdot import Response  # noqa: E402
+
+ADC = {'sensor': 'adc', 'pin': 34, 'raw': 2048, 'voltage': 1.65,
+       'ts': 1760000000}
+DHT = {'sensor': 'dht11', 'temperature': 25.3, 'humidity': 61.2,
+       'ts': 1760000000}
+READINGS = [dict(DHT, ts=1760000000 + i) for i in range(1000)]
+
+
+def get_backends():
+    backends = [('json (stdlib)', lambda obj: json.dumps(obj).encode())]
+    try:
+        import orjson
+        backends.append(('orjson', orjson.dumps))
+    except ImportError:
+        pass
+    try:
+        import ujson
+        backends.append(('ujson', lambda obj: ujson.dumps(obj).encode()))
+    except ImportError:
+        pass
+    return backends
+
+
+def bench(payload, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        Response(payload)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def peak_memory(payload):
+    tracemalloc.start()
+    res = Response(payload)
+    body = res.body if not isinstance(res.body, bytes) else [res.body]
+    for _ in body:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak // 1024
+
+
+def main():
+    backends = get_backends()
+    saved = (Response.json_serializer, Response.json_stream_min_items)
+    print('%-14s %10s %10s %18s' % ('', 'ADC dict', 'DHT dict',
+                                   '1000 DHT readings'))
+    for name, dumps in backends:
+        Response.json_serializer = staticmethod(dumps)
+        print('%-14s %7.2f us %7.2f us %15.0f us' % (
+            name, min(bench(ADC, 20000) for _ in range(3)),
+            min(bench(DHT, 20000) for _ in range(3)),
+            min(bench(READINGS, 200) for _ in range(3))))
+
+    print('\n20000 DHT readings, peak memory while serializing:')
+    big = [dict(DHT, ts=i) for i in range(20000)]
+    for name, dumps in backends:
+        Response.json_serializer = staticmethod(dumps)
+        Response.json_stream_min_items = 0
+        buffered = peak_memory(big)
+        Response.json_stream_min_items = 100
+        streamed = peak_memory(big)
+        print('%-14s %6d KB buffered, %4d KB streamed' % (
+            name, buffered, streamed))
+    Response.json_serializer = staticmethod(saved[0])
+    Response.json_stream_min_items = saved[1]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure how fast ``FormDataIter`` parses a multipart body with a 1MB file
+and saves the file.
+
+Usage::
+
+    python benchmarks/multipart_upload.py [LIB_DIR]
+
+The body is read from an in-memory stream that counts the reads made by the
+parser, and the file is saved to the null device. ``LIB_DIR`` defaults to the
+``lib`` directory of this repository. Pass the ``lib`` directory of another
+checkout to compare with a different version.
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from microdot import AsyncBytesIO  # noqa: E402
+from microdot.multipart import FormDataIter  # noqa: E402
+
+BOUNDARY = 'xYzZY0123456789'
+DATA = os.urandom(1024 * 1024)
+BODY = (b'--' + BOUNDARY.encode() + b'\r\n'
+        b'Content-Disposition: form-data; name="file"; filename="a.bin"'
+        b'\r\n\r\n' + DATA + b'\r\n--' + BOUNDARY.encode() + b'--\r\n')
+
+
+class FakeRequest:
+    content_type = 'multipart/form-data; boundary=' + BOUNDARY
+    content_length = len(BODY)
+
+    def __init__(self):
+        self.stream = AsyncBytesIO(BODY)
+        self.reads = 0
+        read = self.stream.read
+
+        async def counted_read(n=-1):
+            self.reads += 1
+            return await read(n)
+
+        self.stream.read = counted_read
+        if hasattr(self.stream, 'readinto'):
+            readinto = self.stream.readinto
+
+            async def counted_readinto(buf):
+                self.reads += 1
+                return await readinto(buf)
+
+            self.stream.readinto = counted_readinto
+
+
+async def parse(out):
+    req = FakeRequest()
+    start = time.perf_counter()
+    async for name, value in FormDataIter(req):
+        await value.save(out)
+    return time.perf_counter() - start, req.reads
+
+
+async def main():
+    with open(os.devnull, 'wb') as out:
+        best = min([(await parse(out))[0] for _ in range(5)])
+        tracemalloc.start()
+        _, reads = await parse(out)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print('1MB upload: best %.1f ms, %.0f MB/s, stream reads %d, '
+          'peak alloc %d KB' % (best * 1e3, 1 / best, reads, peak // 1024))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
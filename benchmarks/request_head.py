@@ -0,0 +1,62 @@
+"""Measure how many request heads per second ``Request.create()`` can parse.
+
+Usage::
+
+    python benchmarks/request_head.py [LIB_DIR]
+
+The request is a 14-header request as sent by Chrome, fed through an
+``asyncio.StreamReader``. ``LIB_DIR`` defaults to the ``lib`` directory of
+this repository. Pass the ``lib`` directory of another checkout to compare
+with a different version.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from microdot import Microdot, Request  # noqa: E402
+
+REQUEST = (
+    b'GET /static/app.js?v=3 HTTP/1.1\r\n'
+    b'Host: 192.168.4.1:5000\r\n'
+    b'Connection: keep-alive\r\n'
+    b'User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+    b'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 '
+    b'Safari/537.36\r\n'
+    b'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,'
+    b'image/avif,image/webp,*/*;q=0.8\r\n'
+    b'Accept-Encoding: gzip, deflate, br, zstd\r\n'
+    b'Accept-Language: zh-TW,zh;q=0.9,en-US;q=0.8,en;q=0.7\r\n'
+    b'Cache-Control: max-age=0\r\n'
+    b'Upgrade-Insecure-Requests: 1\r\n'
+    b'Sec-Fetch-Dest: document\r\n'
+    b'Sec-Fetch-Mode: navigate\r\n'
+    b'Sec-Fetch-Site: none\r\n'
+    b'Sec-Fetch-User: ?1\r\n'
+    b'If-None-Match: "65f1a2-1c3"\r\n'
+    b'Cookie: session=abc123; theme=dark\r\n\r\n')
+
+
+async def bench(app, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        reader = asyncio.StreamReader()
+        reader.feed_data(REQUEST)
+        reader.feed_eof()
+        req = await Request.create(app, reader, None, ('127.0.0.1', 1))
+    assert len(req.headers) == 14
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    app = Microdot()
+    asyncio.run(bench(app, 2000))  # warm up
+    best = max(asyncio.run(bench(app, 20000)) for _ in range(5))
+    print('%.0f req/s' % best)
+
+
+if __name__ == '__main__':
+    main()
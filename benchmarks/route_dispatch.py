@@ -0,0 +1,77 @@
+"""Compare route dispatch through the route index with a linear scan of the
+URL map, as the number of routes grows.
+
+Usage::
+
+    python benchmarks/route_dispatch.py
+
+Each resource has two routes, a static one and one with an ``<int:id>``
+argument. The lookups are a mix of a dynamic hit, a static hit and a miss.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from microdot import Microdot  # noqa: E402
+
+
+class FakeRequest:
+    method = 'GET'
+    path = '/'
+
+
+def scan(app, path, method):
+    # the dispatch algorithm used before the route index was added
+    f = 404
+    for route_methods, route_pattern, route_handler, _, _ in app.url_map:
+        if route_pattern.match(path) is not None:
+            if method in route_methods:
+                return route_handler
+            f = 405
+    return f
+
+
+def bench(n, reps=2000):
+    app = Microdot()
+    for i in range(n // 2):
+        app.route('/api/item%d' % i)(lambda req: None)
+        app.route('/api/item%d/<int:id>' % i)(lambda req, id: None)
+    paths = ['/api/item%d/5' % (n // 2 - 1), '/api/item%d' % (n // 4),
+             '/missing']
+    req = FakeRequest()
+    for path in paths:
+        # the lookups must agree, and the index is built on the first one
+        req.path = path
+        assert app.find_route(req)[0] == scan(app, path, 'GET')
+
+    start = time.perf_counter()
+    for _ in range(reps):
+        for path in paths:
+            req.path = path
+            app.find_route(req)
+    index = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(reps):
+        for path in paths:
+            scan(app, path, 'GET')
+    linear = time.perf_counter() - start
+
+    lookups = reps * len(paths)
+    return linear / lookups * 1e6, index / lookups * 1e6
+
+
+def main():
+    print('%8s %10s %10s' % ('routes', 'scan us', 'index us'))
+    for n in (20, 100, 400):
+        results = [bench(n) for _ in range(3)]
+        linear = min(r[0] for r in results)
+        index = min(r[1] for r in results)
+        print('%8d %10.1f %10.1f' % (n, linear, index))
+
+
+if __name__ == '__main__':
+    main()
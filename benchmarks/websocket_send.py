@@ -0,0 +1,82 @@
+"""Measure the memory allocated, the number of writes and the throughput of
+``WebSocket.send()`` for several payload sizes.
+
+Usage::
+
+    python benchmarks/websocket_send.py [LIB_DIR]
+
+The frames are written to a fake stream that discards them. ``LIB_DIR``
+defaults to the ``lib`` directory of this repository. Pass the ``lib``
+directory of another checkout to compare with a different version.
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from microdot.websocket import WebSocket  # noqa: E402
+
+
+class FakeWriter:
+    transport = None
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.writes = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        self.writes += 1
+
+    async def drain(self):
+        pass
+
+    async def awrite(self, data):
+        self.bytes_written += len(data)
+        self.writes += 1
+
+
+class FakeRequest:
+    def __init__(self):
+        self.sock = (None, FakeWriter())
+
+
+async def bench(size, count):
+    ws = WebSocket(FakeRequest())
+    data = b'x' * size
+    await ws.send(data)  # warm up
+
+    writer = ws.request.sock[1]
+    writer.writes = 0
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for _ in range(20):
+        await ws.send(data)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    writes = writer.writes / 20
+
+    best = None
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(count):
+            await ws.send(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('%7d B payload: peak extra alloc %7d B, %3.1f writes/msg, '
+          '%8.0f msg/s, %8.1f MB/s' % (size, peak, writes, count / best,
+                                      size * count / best / 1e6))
+
+
+async def main():
+    for size, count in [(30, 100000), (1000, 50000), (16384, 20000),
+                        (262144, 2000)]:
+        await bench(size, count)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""Compare ``WebSocket._unmask`` with the per-byte generator it replaced.
+
+Usage::
+
+    python benchmarks/websocket_unmask.py
+
+Both implementations are first checked to produce the same result for a
+range of payload sizes, including sizes that are not a multiple of four.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lib'))
+
+from microdot.websocket import WebSocket  # noqa: E402
+
+
+def generator_unmask(payload, mask):
+    # the unmasking algorithm used before the integer XOR was added
+    return bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
+
+
+def bench(unmask, payload, mask, reps):
+    start = time.perf_counter()
+    for _ in range(reps):
+        unmask(payload, mask)
+    return (time.perf_counter() - start) / reps * 1e6
+
+
+def main():
+    mask = os.urandom(4)
+    for n in (0, 1, 3, 5, 128, 1024, 4096, 16384, 65536):
+        payload = os.urandom(n)
+        unmasked = WebSocket._unmask(payload, mask)
+        assert unmasked == generator_unmask(payload, mask)
+        assert WebSocket._unmask(unmasked, mask) == payload
+
+    print('%8s %14s %14s %8s' % ('size', 'generator us', 'int XOR us',
+                                 'speedup'))
+    for n in (128, 1024, 4096, 16384, 65536):
+        payload = os.urandom(n)
+        reps = max(20, 200000 // n)
+        old = min(bench(generator_unmask, payload, mask, reps)
+                  for _ in range(3))
+        new = min(bench(WebSocket._unmask, payload, mask, reps * 10)
+                  for _ in range(3))
+        print('%8d %14.1f %14.2f %7.0fx' % (n, old, new, old / new))
+
+
+if __name__ == '__main__':
+    main()
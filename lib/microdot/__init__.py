@@ -1,2 +1,3 @@
 from microdot.microdot import Microdot, Request, Response, abort, redirect, \
-    send_file, URLPattern, AsyncBytesIO, iscoroutine  # noqa: F401
+    send_file, URLPattern, AsyncBytesIO, iscoroutine, inline, blocking, \
+    configure_handlers  # noqa: F401
@@ -1,3 +1,6 @@
+from microdot.microdot import inline
+
+
 class CORS:
     """Add CORS headers to HTTP responses.
 
@@ -102,6 +105,7 @@ class CORS:
 
         return cors_headers
 
+    @inline
     def after_request(self, request, response):
         saved_vary = response.headers.get('Vary')
         response.headers.update(self.get_cors_headers(request))
@@ -13,27 +13,126 @@ import time
 try:
     import orjson as json
 except ImportError:
-    import json
+    try:
+        import ujson as json
+    except ImportError:
+        import json
+
+
+def json_dumps(obj):
+    """Serialize an object to JSON, returned as bytes.
+
+    :param obj: The object to serialize.
+
+    This is the default value of :attr:`Response.json_serializer`. It uses
+    ``orjson`` or ``ujson`` when one of them is installed, or else the
+    ``json`` module.
+    """
+    data = json.dumps(obj)
+    return data if isinstance(data, bytes) else data.encode()
 
 try:
     from inspect import iscoroutinefunction, iscoroutine
     from functools import partial
+    from concurrent.futures import ThreadPoolExecutor
+    from weakref import WeakKeyDictionary
 
-    async def invoke_handler(handler, *args, **kwargs):
-        """Invoke a handler and return the result.
+    _handler_modes = WeakKeyDictionary()
+    _sync_mode = 'blocking'
+    _executor = None
+    _max_workers = 4
 
-        This method runs sync handlers in a thread pool executor.
+    def inline(f):
+        """Decorator that marks a sync handler as safe to run directly in the
+        asyncio thread.
+
+        Use this decorator on short handlers that do not block, so that they
+        do not pay the cost of a thread switch. Example::
+
+            @app.route('/')
+            @inline
+            def index(request):
+                return 'Hello, world!'
         """
+        f._microdot_mode = 'inline'
+        return f
+
+    def blocking(f):
+        """Decorator that marks a sync handler as blocking, so that it always
+        runs in a thread pool executor."""
+        f._microdot_mode = 'blocking'
+        return f
+
+    def configure_handlers(sync_mode=None, max_workers=None):
+        """Configure how sync handlers are invoked.
+
+        :param sync_mode: How to run sync handlers that are not decorated
+                          with :func:`inline` or :func:`blocking`. Use
+                          ``'blocking'`` (the default) to run them in the
+                          executor, or ``'inline'`` to run them in the asyncio
+                          thread.
+        :param max_workers: The number of threads in the executor that runs
+                            blocking handlers. The default is 4.
+        """
+        global _sync_mode, _max_workers, _executor
+        if sync_mode is not None:
+            if sync_mode not in ('inline', 'blocking'):
+                raise ValueError('Invalid sync mode')
+            _sync_mode = sync_mode
+        if max_workers is not None and max_workers != _max_workers:
+            _max_workers = max_workers
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+
+    def _handler_mode(handler):
+        key = getattr(handler, '__func__', handler)
+        try:
+            return _handler_modes[key]
+        except KeyError:
+            pass
+        except TypeError:  # pragma: no cover
+            key = None
         if iscoroutinefunction(handler):
-            ret = await handler(*args, **kwargs)
+            mode = 'async'
         else:
-            ret = await asyncio.get_running_loop().run_in_executor(
-                None, partial(handler, *args, **kwargs))
-        return ret
+            mode = getattr(handler, '_microdot_mode', None)
+        if key is not None:
+            _handler_modes[key] = mode
+        return mode
+
+    async def invoke_handler(handler, *args, **kwargs):
+        """Invoke a handler and return the result.
+
+        This method runs sync handlers in a thread pool executor, unless they
+        are marked as inline.
+        """
+        global _executor
+        mode = _handler_mode(handler)
+        if mode == 'async':
+            return await handler(*args, **kwargs)
+        if (mode or _sync_mode) == 'inline':
+            ret = handler(*args, **kwargs)
+            if iscoroutine(ret):  # pragma: no cover
+                ret = await ret
+            return ret
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_max_workers)
+        return await asyncio.get_running_loop().run_in_executor(
+            _executor, partial(handler, *args, **kwargs))
 except ImportError:  # pragma: no cover
     def iscoroutine(coro):
         return hasattr(coro, 'send') and hasattr(coro, 'throw')
 
+    def inline(f):
+        return f
+
+    def blocking(f):
+        return f
+
+    def configure_handlers(sync_mode=None, max_workers=None):
+        pass
+
     async def invoke_handler(handler, *args, **kwargs):
         """Invoke a handler and return the result.
 
@@ -45,6 +144,15 @@ except ImportError:  # pragma: no cover
             ret = await ret
         return ret
 
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:  # pragma: no cover
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
 try:
     from sys import print_exception
 except ImportError:  # pragma: no cover
@@ -275,8 +383,15 @@ class AsyncBytesIO:
     async def readexactly(self, n):  # pragma: no cover
         return self.stream.read(n)
 
+    async def readinto(self, buf):
+        return self.stream.readinto(buf)
+
     async def readuntil(self, separator=b'\n'):  # pragma: no cover
-        return self.stream.readuntil(separator=separator)
+        data = self.stream.getvalue()
+        pos = self.stream.tell()
+        end = data.find(separator, pos)
+        end = len(data) if end == -1 else end + len(separator)
+        return self.stream.read(end - pos)
 
     async def awrite(self, data):  # pragma: no cover
         return self.stream.write(data)
@@ -285,11 +400,70 @@ class AsyncBytesIO:
         pass
 
 
+class ChunkedStream:
+    """An async stream that decodes a request body sent with the ``chunked``
+    transfer encoding.
+
+    :param stream: the input stream of the connection.
+    :param max_length: the maximum size of the decoded body. Reading a body
+                       that is larger raises a 413 error. If not given, the
+                       size is not limited.
+    """
+    def __init__(self, stream, max_length=None):
+        self.stream = stream
+        self.buffer = b''
+        self.remaining = 0
+        self.done = False
+        #: The size of the body received so far, including the complete size
+        #: of the chunk that is being read.
+        self.length = 0
+        self.max_length = max_length
+
+    async def _next_chunk(self):
+        line = await Request._safe_readline(self.stream)
+        self.remaining = int(line.split(b';', 1)[0].strip(), 16)
+        self.length += self.remaining
+        if self.max_length is not None and self.length > self.max_length:
+            # the chunk is rejected before any of its data is read
+            raise HTTPException(413, 'Payload too large')
+        if self.remaining == 0:
+            # last chunk, skip the optional trailer headers
+            while (await Request._safe_readline(self.stream)).strip():
+                pass
+            self.done = True
+
+    async def read(self, n=-1):
+        data = self.buffer[:n] if n != -1 else self.buffer
+        self.buffer = self.buffer[len(data):]
+        while not self.done and (n == -1 or len(data) < n):
+            if self.remaining == 0:
+                await self._next_chunk()
+                continue
+            size = self.remaining if n == -1 else \
+                min(self.remaining, n - len(data))
+            data += await self.stream.readexactly(size)
+            self.remaining -= size
+            if self.remaining == 0:
+                await self.stream.readexactly(2)  # "\r\n" after chunk data
+        return data
+
+    async def readexactly(self, n):
+        return await self.read(n)
+
+
 class Request:
     """An HTTP request."""
+    __slots__ = ('app', 'client_addr', 'method', 'url', 'url_prefix', 'subapp',
+                 'path', 'query_string', 'headers', 'g', 'http_version',
+                 'body_used', 'sock', 'after_request_handlers', 'url_args',
+                 'asgi_scope', 'environ', '_args', '_cookies',
+                 '_content_length', '_content_type', '_body', '_stream',
+                 '_json', '_form', '_files')
+
     #: Specify the maximum payload size that is accepted. Requests with larger
-    #: payloads will be rejected with a 413 status code. Applications can
-    #: change this maximum as necessary.
+    #: payloads will be rejected with a 413 status code. Bodies sent with the
+    #: ``chunked`` transfer encoding are checked as they are decoded.
+    #: Applications can change this maximum as necessary.
     #:
     #: Example::
     #:
@@ -316,6 +490,40 @@ class Request:
     #:    Request.max_readline = 16 * 1024  # 16KB lines allowed
     max_readline = 2 * 1024
 
+    #: Specify the maximum number of header lines allowed in a request. The
+    #: request line and headers are read as a single block of up to
+    #: ``max_readline * max_headers`` bytes. Requests with a larger header
+    #: block are rejected.
+    #:
+    #: Example::
+    #:
+    #:    Request.max_headers = 64
+    max_headers = 32
+
+    #: The number of seconds a client is given to send the request line and
+    #: headers. Clients that start a request but do not complete the headers
+    #: in time receive a 408 response. Connections on which no request is
+    #: started in time are closed. Set to ``None`` to wait indefinitely.
+    header_timeout = 10
+
+    #: The number of seconds a client is given to send a request body that is
+    #: read into memory. Clients that do not send the body in time receive a
+    #: 408 response. Bodies that are larger than ``max_body_length`` are read
+    #: by the application from ``stream`` and are not subject to this
+    #: timeout. Set to ``None`` to wait indefinitely.
+    body_timeout = 30
+
+    #: The number of seconds between checks of the requests that are being
+    #: read against their timeouts. A single task shared by all the
+    #: connections does these checks, so timeouts are enforced with this
+    #: precision.
+    timeout_resolution = 1
+
+    # the deadlines of the requests that are being read, indexed by the task
+    # that reads them, and the task that enforces them
+    _deadlines = {}
+    _timeout_task = None
+
     class G:
         pass
 
@@ -340,35 +548,22 @@ class Request:
         self.path = url
         #: The query string portion of the URL.
         self.query_string = None
-        #: The parsed query string, as a
-        #: :class:`MultiDict <microdot.MultiDict>` object.
-        self.args = {}
         #: A dictionary with the headers included in the request.
         self.headers = headers
-        #: A dictionary with the cookies included in the request.
-        self.cookies = {}
-        #: The parsed ``Content-Length`` header.
-        self.content_length = 0
-        #: The parsed ``Content-Type`` header.
-        self.content_type = None
         #: A general purpose container for applications to store data during
         #: the life of the request.
         self.g = Request.G()
 
         self.http_version = http_version
-        if '?' in self.path:
-            self.path, self.query_string = self.path.split('?', 1)
-            self.args = self._parse_urlencoded(self.query_string)
-
-        if 'Content-Length' in self.headers:
-            self.content_length = int(self.headers['Content-Length'])
-        if 'Content-Type' in self.headers:
-            self.content_type = self.headers['Content-Type']
-        if 'Cookie' in self.headers:
-            for cookie in self.headers['Cookie'].split(';'):
-                name, value = cookie.strip().split('=', 1)
-                self.cookies[name] = value
-
+        if '?' in url:
+            self.path, self.query_string = url.split('?', 1)
+
+        # the query string, cookies and content headers are parsed on first
+        # access, as many routes never use them
+        self._args = None
+        self._cookies = None
+        self._content_length = None
+        self._content_type = None
         self._body = body
         self.body_used = False
         self._stream = stream
@@ -379,7 +574,8 @@ class Request:
         self.after_request_handlers = []
 
     @staticmethod
-    async def create(app, client_reader, client_writer, client_addr):
+    async def create(app, client_reader, client_writer, client_addr,
+                     idle_timeout=None):
         """Create a request object.
 
         :param app: The Microdot application instance.
@@ -388,43 +584,84 @@ class Request:
         :param client_writer: An output stream where the response data can be
                               written.
         :param client_addr: The address of the client, as a tuple.
+        :param idle_timeout: The number of seconds to wait for the client to
+                             start sending the request. If not given, the
+                             ``header_timeout`` attribute is used.
 
         This method is a coroutine. It returns a newly created ``Request``
-        object.
+        object, or ``None`` if the client closed the connection or did not
+        start a request in time. If the client starts a request but does not
+        send it in time, ``asyncio.TimeoutError`` is raised.
         """
-        # request line
-        line = (await Request._safe_readline(client_reader)).strip().decode()
-        if not line:  # pragma: no cover
-            return None
-        method, url, http_version = line.split()
-        http_version = http_version.split('/', 1)[1]
-
-        # headers
-        headers = NoCaseDict()
-        content_length = 0
-        while True:
-            line = (await Request._safe_readline(
-                client_reader)).strip().decode()
-            if line == '':
-                break
-            header, value = line.split(':', 1)
-            value = value.strip()
-            headers[header] = value
-            if header.lower() == 'content-length':
-                content_length = int(value)
+        # the reads are not wrapped in a timeout of their own; instead, the
+        # deadline of the current part of the request is recorded, and the
+        # shared timeout task cancels the read if it expires
+        task = Request._set_deadline(idle_timeout or Request.header_timeout)
+        head = None
+        try:
+            # wait for the client to start a request
+            head = await client_reader.read(1)
+            if not head:  # pragma: no cover
+                return None
 
-        # body
-        body = b''
-        if content_length and content_length <= Request.max_body_length:
-            body = await client_reader.readexactly(content_length)
-            stream = None
-        else:
+            # request line and headers
+            Request._set_deadline(Request.header_timeout, task)
+            head += await Request._read_head(client_reader)
+            lines = head.decode().split('\n')
+            line = lines[0].strip()
+            if not line:  # pragma: no cover
+                return None
+            method, url, http_version = line.split()
+            http_version = http_version.split('/', 1)[1]
+            headers, content_length, chunked = Request._parse_headers(lines)
+
+            # body
+            Request._set_deadline(Request.body_timeout, task)
             body = b''
-            stream = client_reader
+            if chunked:
+                # bodies that fit in memory are decoded into the request,
+                # larger ones are decoded on the fly as the application reads
+                # the stream
+                stream = ChunkedStream(client_reader,
+                                       Request.max_content_length)
+                try:
+                    body = await stream.read(Request.max_body_length + 1)
+                except HTTPException:
+                    # the content length is set to the size of the body
+                    # received so far, which is over the limit, so that the
+                    # request is answered with a 413 error
+                    content_length = stream.length
+                    body = b''
+                if stream.done and len(body) <= Request.max_body_length:
+                    stream = None
+                else:
+                    stream.buffer = body
+                    body = b''
+            elif content_length and \
+                    content_length <= Request.max_body_length:
+                body = await client_reader.readexactly(content_length)
+                stream = None
+            else:
+                body = b''
+                stream = client_reader
+        except asyncio.CancelledError:
+            if Request._deadlines.get(task, 0) is not None:
+                raise  # not cancelled by the timeout task
+            if hasattr(task, 'uncancel'):  # pragma: no branch
+                task.uncancel()
+            if head is None:
+                # the client did not start a request in time
+                return None
+            raise asyncio.TimeoutError()
+        finally:
+            Request._deadlines.pop(task, None)
 
-        return Request(app, client_addr, method, url, http_version, headers,
-                       body=body, stream=stream,
-                       sock=(client_reader, client_writer))
+        req = Request(app, client_addr, method, url, http_version, headers,
+                      body=body, stream=stream,
+                      sock=(client_reader, client_writer))
+        # the content length was parsed along with the headers
+        req._content_length = content_length
+        return req
 
     def _parse_urlencoded(self, urlencoded):
         data = MultiDict()
@@ -441,6 +678,59 @@ class Request:
                         if len(kv) > 1 else b''
         return data
 
+    @property
+    def args(self):
+        """The parsed query string, as a
+        :class:`MultiDict <microdot.MultiDict>` object."""
+        if self._args is None:
+            if self.query_string is None:
+                self._args = {}
+            else:
+                self._args = self._parse_urlencoded(self.query_string)
+        return self._args
+
+    @args.setter
+    def args(self, value):
+        self._args = value
+
+    @property
+    def cookies(self):
+        """A dictionary with the cookies included in the request."""
+        if self._cookies is None:
+            self._cookies = {}
+            cookies = self.headers.get('Cookie')
+            if cookies:
+                for cookie in cookies.split(';'):
+                    name, value = cookie.strip().split('=', 1)
+                    self._cookies[name] = value
+        return self._cookies
+
+    @cookies.setter
+    def cookies(self, value):
+        self._cookies = value
+
+    @property
+    def content_length(self):
+        """The parsed ``Content-Length`` header."""
+        if self._content_length is None:
+            self._content_length = int(self.headers.get('Content-Length', 0))
+        return self._content_length
+
+    @content_length.setter
+    def content_length(self, value):
+        self._content_length = value
+
+    @property
+    def content_type(self):
+        """The parsed ``Content-Type`` header."""
+        if self._content_type is None:
+            self._content_type = self.headers.get('Content-Type')
+        return self._content_type
+
+    @content_type.setter
+    def content_type(self, value):
+        self._content_type = value
+
     @property
     def body(self):
         """The body of the request, as bytes."""
@@ -522,6 +812,118 @@ class Request:
         self.after_request_handlers.append(f)
         return f
 
+    @staticmethod
+    async def _read_head(stream):
+        max_size = Request.max_readline * Request.max_headers
+        lines = []
+        if hasattr(stream, 'readuntil'):
+            head = b''
+            try:
+                head = await stream.readuntil(b'\n')
+                if not head.strip():  # pragma: no cover
+                    return head
+                if head.endswith(b'\r\n'):
+                    # read the headers in one go; the block ends with an
+                    # empty line, which is right at the start when there are
+                    # no headers
+                    rest = await stream.readexactly(2)
+                    if rest != b'\r\n':
+                        rest += await stream.readuntil(b'\n\r\n')
+                    head += rest
+                    if len(head) > max_size:
+                        raise ValueError('headers too long')
+                    return head
+            except asyncio.IncompleteReadError as exc:  # pragma: no cover
+                return head + exc.partial
+            except asyncio.LimitOverrunError:  # pragma: no cover
+                raise ValueError('headers too long')
+            # the request uses bare LF line endings, which are accepted as
+            # when reading line by line
+            if len(head) > Request.max_readline:
+                raise ValueError('line too long')
+            lines.append(head)
+        # MicroPython streams do not implement readuntil()
+        size = sum(len(line) for line in lines)
+        while True:
+            line = await Request._safe_readline(stream)
+            lines.append(line)
+            size += len(line)
+            if size > max_size:
+                raise ValueError('headers too long')
+            if not line.strip():
+                return b''.join(lines)
+
+    @staticmethod
+    def _parse_headers(lines):
+        # the case-insensitive key map of the headers dictionary is built
+        # here directly, instead of going through NoCaseDict.__setitem__ for
+        # each header
+        headers = {}
+        keymap = {}
+        content_length = 0
+        chunked = False
+        max_readline = Request.max_readline
+        for i in range(1, len(lines)):
+            line = lines[i]
+            if len(line) > max_readline:
+                raise ValueError('line too long')
+            line = line.strip()
+            if not line:
+                break
+            header, value = line.split(':', 1)
+            value = value.strip()
+            kl = header.lower()
+            if kl in keymap:
+                header = keymap[kl]
+            else:
+                keymap[kl] = header
+            headers[header] = value
+            if kl == 'content-length':
+                content_length = int(value)
+            elif kl == 'transfer-encoding':
+                chunked = 'chunked' in value.lower()
+        # the values and key map are installed directly, as the NoCaseDict
+        # constructor would lower each header name again
+        values = headers
+        headers = NoCaseDict()
+        dict.update(headers, values)
+        headers.keymap = keymap
+        return headers, content_length, chunked
+
+    @staticmethod
+    def _set_deadline(timeout, task=None):
+        task = task or asyncio.current_task()
+        if timeout is None:
+            Request._deadlines.pop(task, None)
+            return task
+        Request._deadlines[task] = (ticks_ms(), int(timeout * 1000))
+        if Request._timeout_task is None:
+            Request._timeout_task = asyncio.create_task(
+                Request._expire_deadlines())
+        return task
+
+    @staticmethod
+    async def _expire_deadlines():
+        try:
+            while Request._deadlines:
+                await asyncio.sleep(Request.timeout_resolution)
+                now = ticks_ms()
+                for task, deadline in list(Request._deadlines.items()):
+                    if deadline is not None and \
+                            ticks_diff(now, deadline[0]) >= deadline[1]:
+                        # the entry is kept, to let the request know that it
+                        # was cancelled because its deadline expired
+                        Request._deadlines[task] = None
+                        task.cancel()
+        finally:
+            Request._timeout_task = None
+
+    @staticmethod
+    async def _wait_for(coro, timeout):
+        if timeout is None:
+            return await coro
+        return await asyncio.wait_for(coro, timeout)
+
     @staticmethod
     async def _safe_readline(stream):
         line = (await stream.readline())
@@ -542,8 +944,9 @@ class Response:
                         default is 200.
     :param headers: A dictionary of headers to include in the response.
     :param reason: A custom reason phrase to add after the status code. The
-                   default is "OK" for responses with a 200 status code and
-                   "N/A" for any other status codes.
+                   default is the phrase given for the status code in
+                   :attr:`reasons`, or "N/A" for status codes that are not
+                   listed there.
     """
     types_map = {
         'css': 'text/css',
@@ -557,8 +960,41 @@ class Response:
         'svg': 'image/svg+xml',
     }
 
+    #: The size of the buffer used to read files sent with
+    #: :meth:`send_file`. A single buffer of this size is allocated for each
+    #: file response, and it is shrunk to the size of the file when the file
+    #: is smaller. A different size can be given for a specific response with
+    #: the ``buffer_size`` argument of :meth:`send_file`.
     send_file_buffer_size = 1024
 
+    #: The largest body that is sent to the client in the same write as the
+    #: status line and headers. Larger bodies and streaming bodies are sent
+    #: with separate writes after the headers.
+    max_inline_body_size = 1024
+
+    #: The reason phrases sent with the status codes that responses use most
+    #: often, including those of the responses generated by Microdot.
+    reasons = {
+        200: 'OK',
+        204: 'No Content',
+        206: 'Partial Content',
+        301: 'Moved Permanently',
+        302: 'Found',
+        304: 'Not Modified',
+        400: 'Bad Request',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+        408: 'Request Timeout',
+        413: 'Payload Too Large',
+        416: 'Range Not Satisfiable',
+        500: 'Internal Server Error',
+        503: 'Service Unavailable',
+    }
+
+    # encoded status lines for the default reasons, keyed by HTTP version
+    # and status code
+    status_lines = {}
+
     #: The content type to use for responses that do not explicitly define a
     #: ``Content-Type`` header.
     default_content_type = 'text/plain'
@@ -567,6 +1003,31 @@ class Response:
     #: of ``None`` means that no ``Cache-Control`` header is added.
     default_send_file_max_age = None
 
+    #: A function that loads the files sent with :meth:`send_file`. The
+    #: function receives the response and the path of the file, and must set
+    #: the body of the response. The default is ``None``, which opens the
+    #: file. The :class:`StaticFiles <microdot.static.StaticFiles>`
+    #: extension sets this function to add validators to file responses.
+    file_loader = None
+
+    #: The function that serializes dictionary and list bodies to JSON. The
+    #: function receives the body and must return it serialized as bytes.
+    #:
+    #: Example::
+    #:
+    #:    import orjson
+    #:    Response.json_serializer = orjson.dumps
+    json_serializer = staticmethod(json_dumps)
+
+    #: The minimum number of items a list body must have to be serialized
+    #: incrementally and sent as a streaming response, instead of being
+    #: serialized in a single buffer. Set to 0 to disable streaming.
+    json_stream_min_items = 0
+
+    #: The number of list items serialized in each chunk of a streaming JSON
+    #: response.
+    json_stream_chunk_items = 32
+
     #: Special response used to signal that a response does not need to be
     #: written to the client. Used to exit WebSocket connections cleanly.
     already_handled = None
@@ -579,7 +1040,11 @@ class Response:
         self.headers = NoCaseDict(headers or {})
         self.reason = reason
         if isinstance(body, (dict, list)):
-            body = json.dumps(body)
+            if isinstance(body, list) and self.json_stream_min_items and \
+                    len(body) >= self.json_stream_min_items:
+                body = self._json_stream(body)
+            else:
+                body = type(self).json_serializer(body)
             self.headers['Content-Type'] = 'application/json; charset=UTF-8'
         if isinstance(body, str):
             self.body = body.encode()
@@ -587,6 +1052,21 @@ class Response:
             # this applies to bytes, file-like objects or generators
             self.body = body
         self.is_head = False
+        self.http_version = '1.0'
+        self.file_path = None
+        self.frozen = None
+
+    def _json_stream(self, items):
+        dumps = type(self).json_serializer
+        n = self.json_stream_chunk_items
+        yield b'['
+        for i in range(0, len(items), n):
+            chunk = []
+            for item in items[i:i + n]:
+                data = dumps(item)
+                chunk.append(data.encode() if isinstance(data, str) else data)
+            yield b','.join(chunk) if i == 0 else b',' + b','.join(chunk)
+        yield b']'
 
     def set_cookie(self, cookie, value, path=None, domain=None, expires=None,
                    max_age=None, secure=False, http_only=False,
@@ -642,35 +1122,96 @@ class Response:
         if isinstance(self.body, bytes) and \
                 'Content-Length' not in self.headers:
             self.headers['Content-Length'] = str(len(self.body))
+        if self.http_version == '1.1' and \
+                'Content-Length' not in self.headers:
+            # streaming bodies are sent in chunks to HTTP/1.1 clients, so
+            # that the connection does not need to be closed to end the body
+            self.headers['Transfer-Encoding'] = 'chunked'
         if 'Content-Type' not in self.headers:
             self.headers['Content-Type'] = self.default_content_type
             if 'charset=' not in self.headers['Content-Type']:
                 self.headers['Content-Type'] += '; charset=UTF-8'
 
+    def freeze(self):
+        """Pre-render the response, so that it can be returned by many
+        requests without being rebuilt each time.
+
+        The status line, headers and body of a frozen response are rendered
+        once for each combination of HTTP version and ``Connection`` header,
+        and then sent with a single write. A frozen response is shared by all
+        the requests that return it, so it must not be modified after it is
+        frozen. Requests that have after request handlers receive a copy of
+        the response that is rendered normally. Only responses with a body
+        given as a string, bytes, dictionary or list can be frozen. This
+        method returns the response.
+
+        Example::
+
+            health = Response({'status': 'ok'}).freeze()
+
+            @app.get('/health')
+            async def health_check(request):
+                return health
+        """
+        if not isinstance(self.body, bytes):
+            raise ValueError('Only responses with a static body can be frozen')
+        self.complete()
+        self.frozen = {}
+        return self
+
+    def _instance(self, thaw=False):
+        # frozen responses are shared, so each request sends its own copy,
+        # which keeps the pre-rendered bytes unless it needs to be modified
+        if thaw:
+            return Response(self.body, self.status_code, self.headers,
+                            self.reason)
+        res = Response(self.body, self.status_code, None, self.reason)
+        res.headers = self.headers
+        res.frozen = self.frozen
+        return res
+
     async def write(self, stream):
         self.complete()
 
         try:
-            # status code
-            reason = self.reason if self.reason is not None else \
-                ('OK' if self.status_code == 200 else 'N/A')
-            await stream.awrite('HTTP/1.0 {status_code} {reason}\r\n'.format(
-                status_code=self.status_code, reason=reason).encode())
-
-            # headers
-            for header, value in self.headers.items():
-                values = value if isinstance(value, list) else [value]
-                for value in values:
-                    await stream.awrite('{header}: {value}\r\n'.format(
-                        header=header, value=value).encode())
-            await stream.awrite(b'\r\n')
+            if self.frozen is not None:
+                key = (self.http_version, self.status_code, self.is_head,
+                       self.headers.get('Connection'))
+                data = self.frozen.get(key)
+                if data is None:
+                    data = self._render_head()
+                    if not self.is_head:
+                        data += self.body
+                    self.frozen[key] = data
+                await stream.awrite(data)
+                return
+
+            # status line and headers, along with the body when it is small
+            # enough, are sent in a single write
+            head = self._render_head()
+            inline = not self.is_head and isinstance(self.body, bytes) and \
+                len(self.body) <= self.max_inline_body_size
+            await stream.awrite(head + self.body if inline else head)
 
             # body
-            if not self.is_head:
+            chunked = self.headers.get('Transfer-Encoding') == 'chunked'
+            if self.is_head or inline:
+                pass
+            elif hasattr(self.body, 'readinto') and \
+                    hasattr(self.body, 'close'):
+                # file objects are sent through a reusable buffer
+                await self._write_file(stream, chunked)
+            else:
                 iter = self.body_iter()
                 async for body in iter:
                     if isinstance(body, str):  # pragma: no cover
                         body = body.encode()
+                    if chunked:
+                        if not body:
+                            # an empty chunk would end the body
+                            continue
+                        body = '{:x}\r\n'.format(len(body)).encode() + \
+                            body + b'\r\n'
                     try:
                         await stream.awrite(body)
                     except OSError as exc:  # pragma: no cover
@@ -681,6 +1222,8 @@ class Response:
                         raise
                 if hasattr(iter, 'aclose'):  # pragma: no branch
                     await iter.aclose()
+                if chunked:
+                    await stream.awrite(b'0\r\n\r\n')
 
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS or \
@@ -689,6 +1232,61 @@ class Response:
             else:
                 raise
 
+    async def _write_file(self, stream, chunked):
+        try:
+            if not chunked and hasattr(stream, 'transport'):
+                try:
+                    self.body.fileno()
+                except (AttributeError, OSError, ValueError):
+                    pass
+                else:
+                    # on CPython the event loop uses os.sendfile() when the
+                    # transport supports it, or else a buffered copy
+                    await asyncio.get_running_loop().sendfile(
+                        stream.transport, self.body, self.body.tell())
+                    return
+            buffer = bytearray(self.send_file_buffer_size)
+            view = memoryview(buffer)
+            while True:
+                n = self.body.readinto(buffer)
+                if iscoroutine(n):  # pragma: no cover
+                    n = await n
+                if not n:
+                    break
+                if chunked:
+                    await stream.awrite('{:x}\r\n'.format(n).encode() +
+                                        view[:n] + b'\r\n')
+                else:
+                    await stream.awrite(view[:n])
+            if chunked:
+                await stream.awrite(b'0\r\n\r\n')
+        finally:
+            if hasattr(self.body, 'close'):  # pragma: no branch
+                result = self.body.close()
+                if iscoroutine(result):  # pragma: no cover
+                    await result
+
+    def _render_head(self):
+        key = (self.http_version, self.status_code)
+        status_line = self.status_lines.get(key) \
+            if self.reason is None else None
+        if status_line is None:
+            reason = self.reason if self.reason is not None else \
+                self.reasons.get(self.status_code, 'N/A')
+            status_line = 'HTTP/{version} {status_code} {reason}\r\n'.format(
+                version=self.http_version, status_code=self.status_code,
+                reason=reason).encode()
+            if self.reason is None:
+                self.status_lines[key] = status_line
+        headers = []
+        for header, value in self.headers.items():
+            values = value if isinstance(value, list) else [value]
+            for value in values:
+                headers.append('{header}: {value}\r\n'.format(
+                    header=header, value=value))
+        headers.append('\r\n')
+        return status_line + ''.join(headers).encode()
+
     def body_iter(self):
         if hasattr(self.body, '__anext__'):
             # response body is an async generator
@@ -758,7 +1356,7 @@ class Response:
     @classmethod
     def send_file(cls, filename, status_code=200, content_type=None,
                   stream=None, max_age=None, compressed=False,
-                  file_extension=''):
+                  file_extension='', buffer_size=None):
         """Send file contents in a response.
 
         :param filename: The filename of the file.
@@ -785,6 +1383,10 @@ class Response:
                                parameter when opening the file, including the
                                dot. The extension given here is not considered
                                when generating the ``Content-Type`` header.
+        :param buffer_size: The size of the buffer used to read the file. If
+                            omitted, the value of the
+                            :attr:`Response.send_file_buffer_size` attribute
+                            is used.
 
         Security note: The filename is assumed to be trusted. Never pass
         filenames provided by the user without validating and sanitizing them
@@ -810,8 +1412,16 @@ class Response:
             headers['Content-Encoding'] = compressed \
                 if isinstance(compressed, str) else 'gzip'
 
-        f = stream or open(filename + file_extension, 'rb')
-        return cls(body=f, status_code=status_code, headers=headers)
+        res = cls(body=stream or b'', status_code=status_code,
+                  headers=headers)
+        if buffer_size is not None:
+            res.send_file_buffer_size = buffer_size
+        if stream is None:
+            if cls.file_loader is not None:
+                cls.file_loader(res, filename + file_extension)
+            else:
+                res.body = open(filename + file_extension, 'rb')
+        return res
 
 
 class URLPattern():
@@ -835,6 +1445,10 @@ class URLPattern():
         'int': lambda value: int(value),
     }
 
+    #: The characters that give a static path segment a special meaning when
+    #: it is inserted in the regular expression of the URL pattern.
+    regex_chars = '.^$*+?{}[]\\|()'
+
     @classmethod
     def register_type(cls, type_name, pattern='[^/]+', parser=None):
         """Register a new URL segment type.
@@ -854,6 +1468,7 @@ class URLPattern():
         self.url_pattern = url_pattern
         self.segments = []
         self.regex = None
+        self.static_path = None
 
     def compile(self):
         """Generate a regular expression for the URL pattern.
@@ -886,6 +1501,9 @@ class URLPattern():
                 pattern += '/' + segment
                 self.segments.append({'parser': None})
         self.regex = re.compile('^' + pattern + '$')
+        if not [c for c in pattern if c in self.regex_chars]:
+            # static patterns are matched with a string comparison
+            self.static_path = pattern
         return self.regex
 
     def match(self, path):
@@ -894,8 +1512,12 @@ class URLPattern():
         Returns a dictionary with the values of all dynamic path segments if a
         matche is found, or ``None`` if the path does not match this pattern.
         """
+        if self.regex is None:
+            self.compile()
+        if self.static_path is not None:
+            return {} if path == self.static_path else None
         args = {}
-        g = (self.regex or self.compile()).match(path)
+        g = self.regex.match(path)
         if not g:
             return
         i = 1
@@ -915,6 +1537,87 @@ class URLPattern():
         return 'URLPattern: {}'.format(self.url_pattern)
 
 
+class RouteIndex:
+    """An index of the URL map of an application, which returns the routes
+    that can match a given path without testing every URL pattern.
+
+    :param url_map: The URL map to index.
+
+    Static URL patterns are stored in a dictionary keyed by their path.
+    Dynamic URL patterns are stored in a tree of path segments, where segments
+    of type ``string`` and ``int`` match any path segment. URL patterns with
+    segments that can span several path segments, such as those of type
+    ``path`` or regular expressions, are returned as candidates for any path
+    that shares their leading static segments.
+
+    The candidates returned for a path are given in URL map order, and still
+    need to be matched against their URL patterns.
+    """
+    #: The regular expressions of segment types that never match a slash.
+    single_segment_patterns = ['/([^/]+)', '/(-?\\d+)']
+
+    def __init__(self, url_map):
+        self.size = len(url_map)
+        self.static = {}
+        # a tree node is a list with the static children dictionary, the
+        # wildcard child node, the routes that end at the node and the routes
+        # that can match any path below the node
+        self.tree = [{}, None, [], []]
+        for i, route in enumerate(url_map):
+            self._add(i, route[1].url_pattern)
+
+    def _add(self, index, url_pattern):
+        segments = url_pattern.lstrip('/').split('/')
+        dynamic = [s for s in segments if s and s[0] == '<']
+        if not dynamic and not [
+                c for c in url_pattern if c in URLPattern.regex_chars]:
+            path = '/' + '/'.join(segments)
+            self.static.setdefault(path, []).append(index)
+            return
+        node = self.tree
+        for segment in segments:
+            if segment and segment[0] == '<':
+                type_ = segment[1:-1].rsplit(':', 1)[0] \
+                    if ':' in segment else 'string'
+                if segment[-1] != '>' or URLPattern.segment_patterns.get(
+                        type_) not in self.single_segment_patterns:
+                    node[3].append(index)
+                    return
+                if node[1] is None:
+                    node[1] = [{}, None, [], []]
+                node = node[1]
+            elif [c for c in segment if c in URLPattern.regex_chars]:
+                node[3].append(index)
+                return
+            else:
+                if segment not in node[0]:
+                    node[0][segment] = [{}, None, [], []]
+                node = node[0][segment]
+        node[2].append(index)
+
+    def _find(self, node, segments, i, found):
+        found.extend(node[3])
+        if i == len(segments):
+            found.extend(node[2])
+            return
+        if segments[i] in node[0]:
+            self._find(node[0][segments[i]], segments, i + 1, found)
+        if node[1] is not None:
+            self._find(node[1], segments, i + 1, found)
+
+    def find(self, path):
+        """Return the indexes in the URL map of the routes that can match the
+        given path, in ascending order.
+
+        :param path: The path to look up.
+        """
+        found = list(self.static.get(path, []))
+        if path[:1] == '/':
+            self._find(self.tree, path[1:].split('/'), 0, found)
+        found.sort()
+        return found
+
+
 class HTTPException(Exception):
     def __init__(self, status_code, reason=None):
         self.status_code = status_code
@@ -937,6 +1640,51 @@ class Microdot:
 
         app = Microdot()
     """
+    #: The number of seconds an idle persistent connection is kept open while
+    #: waiting for the client to send its next request. Set to a positive
+    #: value to enable HTTP/1.1 keep-alive, which allows browsers to load a
+    #: page and all its assets over a single connection. The default is 0,
+    #: which closes the connection after each response.
+    #:
+    #: Example::
+    #:
+    #:    app.keep_alive_timeout = 5  # keep idle connections for 5 seconds
+    keep_alive_timeout = 0
+
+    #: The maximum number of requests that are served over a single
+    #: persistent connection before it is closed. Set to 0 for no limit.
+    max_keep_alive_requests = 100
+
+    #: The maximum number of connections that are handled at the same time.
+    #: Connections that arrive while this limit is reached wait for a free
+    #: slot, up to :attr:`max_queued_connections`. Set to 0 for no limit,
+    #: which is the default.
+    #:
+    #: Example::
+    #:
+    #:    app.max_connections = 4  # handle at most 4 clients at a time
+    max_connections = 0
+
+    #: The maximum number of connections that can wait for a free slot when
+    #: :attr:`max_connections` is reached. Connections that arrive when the
+    #: queue is full receive a 503 response and are closed.
+    max_queued_connections = 8
+
+    #: The number of seconds sent in the ``Retry-After`` header of the 503
+    #: responses issued to rejected connections.
+    retry_after = 1
+
+    #: The maximum number of seconds spent reading the request of a rejected
+    #: connection before the 503 response is sent to it.
+    reject_read_timeout = 0.2
+
+    #: The pre-rendered responses used for errors that do not have an error
+    #: handler, indexed by status code and reason.
+    error_responses = {}
+
+    # incremented when request handlers are registered in any application,
+    # to invalidate the handler chains built by get_request_handlers()
+    handlers_version = 0
 
     def __init__(self):
         self.url_map = []
@@ -948,6 +1696,19 @@ class Microdot:
         self.options_handler = self.default_options_handler
         self.debug = False
         self.server = None
+        self.route_index = None
+        self.handler_chains = {}
+        self.handler_chains_version = Microdot.handlers_version
+        #: Counters for the connections handled by the embedded web server.
+        #: ``active`` and ``queued`` are the connections currently being
+        #: handled and waiting to be handled, and ``rejected`` is the total
+        #: number of connections that received a 503 response because the
+        #: server was saturated. ``timeouts`` is the total number of requests
+        #: that received a 408 response because the client was too slow to
+        #: send them.
+        self.stats = {'active': 0, 'queued': 0, 'rejected': 0,
+                      'timeouts': 0}
+        self.connection_waiters = []
 
     def route(self, url_pattern, methods=None):
         """Decorator that is used to register a function as a request handler
@@ -1088,6 +1849,7 @@ class Microdot:
                 # ...
         """
         self.before_request_handlers.append(f)
+        Microdot.handlers_version += 1
         return f
 
     def after_request(self, f):
@@ -1104,6 +1866,7 @@ class Microdot:
                 return response
         """
         self.after_request_handlers.append(f)
+        Microdot.handlers_version += 1
         return f
 
     def after_error_request(self, f):
@@ -1122,6 +1885,7 @@ class Microdot:
                 return response
         """
         self.after_error_request_handlers.append(f)
+        Microdot.handlers_version += 1
         return f
 
     def errorhandler(self, status_code_or_exception_class):
@@ -1177,6 +1941,7 @@ class Microdot:
             for status_code, handler in subapp.error_handlers.items():
                 self.error_handlers[status_code] = handler
             subapp.error_handlers = {}
+        Microdot.handlers_version += 1
 
     @staticmethod
     def abort(status_code, reason=None):
@@ -1256,7 +2021,13 @@ class Microdot:
                 writer.awrite = MethodType(awrite, writer)
                 writer.aclose = MethodType(aclose, writer)
 
-            await self.handle_request(reader, writer)
+            if not await self._acquire_connection():
+                await self._reject_connection(reader, writer)
+                return
+            try:
+                await self.handle_request(reader, writer)
+            finally:
+                self._release_connection()
 
         if self.debug:  # pragma: no cover
             print('Starting async server on {host}:{port}...'.format(
@@ -1329,8 +2100,20 @@ class Microdot:
                 request.app.shutdown()
                 return 'The server is shutting down...'
         """
+        self.shutdown_requested = True
         self.server.close()
 
+    def get_route_index(self):
+        """Return the index of the URL map used to dispatch requests.
+
+        The index is built the first time a request is dispatched, and is
+        rebuilt if routes are added to the application afterwards.
+        """
+        if self.route_index is None or \
+                self.route_index.size != len(self.url_map):
+            self.route_index = RouteIndex(self.url_map)
+        return self.route_index
+
     def find_route(self, req):
         method = req.method.upper()
         if method == 'OPTIONS' and self.options_handler:
@@ -1340,8 +2123,10 @@ class Microdot:
         f = 404
         p = ''
         s = None
-        for route_methods, route_pattern, route_handler, url_prefix, subapp \
-                in self.url_map:
+        req.url_args = None
+        for i in self.get_route_index().find(req.path):
+            route_methods, route_pattern, route_handler, url_prefix, subapp \
+                = self.url_map[i]
             req.url_args = route_pattern.match(req.path)
             if req.url_args is not None:
                 p = url_prefix
@@ -1355,7 +2140,8 @@ class Microdot:
 
     def default_options_handler(self, req):
         allow = []
-        for route_methods, route_pattern, _, _, _ in self.url_map:
+        for i in self.get_route_index().find(req.path):
+            route_methods, route_pattern, _, _, _ = self.url_map[i]
             if route_pattern.match(req.path) is not None:
                 allow.extend(route_methods)
         if 'GET' in allow:
@@ -1364,34 +2150,184 @@ class Microdot:
         return {'Allow': ', '.join(allow)}
 
     async def handle_request(self, reader, writer):
-        req = None
-        try:
-            req = await Request.create(self, reader, writer,
-                                       writer.get_extra_info('peername'))
-        except Exception as exc:  # pragma: no cover
-            print_exception(exc)
-
-        res = await self.dispatch_request(req)
+        num_requests = 0
+        keep_alive = True
+        while keep_alive:
+            req = None
+            timed_out = False
+            try:
+                # on persistent connections, the client is given the
+                # keep-alive timeout to send its next request
+                req = await Request.create(
+                    self, reader, writer, writer.get_extra_info('peername'),
+                    idle_timeout=self.keep_alive_timeout if num_requests
+                    else None)
+                if req is None:
+                    # the client closed the connection or did not start a
+                    # request in time
+                    break
+            except asyncio.TimeoutError:
+                timed_out = True
+            except Exception as exc:  # pragma: no cover
+                print_exception(exc)
+            num_requests += 1
+
+            if timed_out:
+                self.stats['timeouts'] += 1
+                res = Response('Request timeout', 408)
+                keep_alive = False
+            else:
+                res = await self.dispatch_request(req)
+                keep_alive = self._keep_alive(req, res, num_requests)
+            try:
+                if res != Response.already_handled:  # pragma: no branch
+                    await res.write(writer)
+            except OSError as exc:  # pragma: no cover
+                if exc.errno in MUTED_SOCKET_ERRORS:
+                    keep_alive = False
+                else:
+                    raise
+            if self.debug and req:  # pragma: no cover
+                print('{method} {path} {status_code}'.format(
+                    method=req.method, path=req.path,
+                    status_code=res.status_code))
         try:
-            if res != Response.already_handled:  # pragma: no branch
-                await res.write(writer)
             await writer.aclose()
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS:
                 pass
             else:
                 raise
-        if self.debug and req:  # pragma: no cover
-            print('{method} {path} {status_code}'.format(
-                method=req.method, path=req.path,
-                status_code=res.status_code))
+
+    async def _acquire_connection(self):
+        if not self.max_connections or \
+                self.stats['active'] < self.max_connections:
+            self.stats['active'] += 1
+            return True
+        if self.stats['queued'] >= self.max_queued_connections:
+            self.stats['rejected'] += 1
+            return False
+        # wait in line until a connection that ends hands over its slot
+        event = asyncio.Event()
+        self.connection_waiters.append(event)
+        self.stats['queued'] += 1
+        try:
+            await event.wait()
+        except BaseException:
+            if event in self.connection_waiters:
+                self.connection_waiters.remove(event)
+            elif event.is_set():  # pragma: no cover
+                self._release_connection()
+            raise
+        finally:
+            self.stats['queued'] -= 1
+        return True
+
+    def _release_connection(self):
+        if self.connection_waiters:
+            # the slot is handed over to the oldest waiting connection
+            self.connection_waiters.pop(0).set()
+        else:
+            self.stats['active'] -= 1
+
+    async def _reject_connection(self, reader, writer):
+        async def skip_request_head():
+            # the head is read with the same limits as accepted requests, so
+            # that rejected clients cannot make the server buffer more data
+            limit = Request.max_readline * Request.max_headers
+            while limit > 0:
+                line = await Request._safe_readline(reader)
+                if not line.strip():
+                    break
+                limit -= len(line)
+
+        res = Response('Service unavailable', 503,
+                       {'Retry-After': str(self.retry_after)})
+        try:
+            # the request is read before responding, because closing a
+            # connection with unread data resets it and the client may not
+            # get to see the response
+            await asyncio.wait_for(skip_request_head(),
+                                   self.reject_read_timeout)
+        except Exception:
+            pass
+        try:
+            await res.write(writer)
+            await writer.aclose()
+        except OSError as exc:  # pragma: no cover
+            if exc.errno not in MUTED_SOCKET_ERRORS:
+                raise
+
+    def _keep_alive(self, req, res, num_requests):
+        """Decide if the connection can be reused after this response, and
+        update the response with the matching protocol version and
+        ``Connection`` header.
+        """
+        if not self.keep_alive_timeout or req is None or \
+                res == Response.already_handled:
+            return False
+        if req.http_version not in ['1.0', '1.1']:  # pragma: no cover
+            return False
+        connection = req.headers.get('Connection', '').lower()
+        if req.http_version == '1.1':
+            res.http_version = '1.1'
+            keep_alive = 'close' not in connection
+        else:
+            keep_alive = 'keep-alive' in connection
+        if self.shutdown_requested or self.connection_waiters or (
+                self.max_keep_alive_requests and
+                num_requests >= self.max_keep_alive_requests):
+            # connections waiting for a slot take precedence over idle ones
+            keep_alive = False
+        elif req.content_length > Request.max_body_length or (
+                isinstance(req._stream, ChunkedStream) and
+                not req._stream.done):
+            # the body of the request was not read in full, so the stream is
+            # not positioned at the start of the next request
+            keep_alive = False
+        if keep_alive and req.http_version == '1.0':
+            res.complete()
+            if 'Content-Length' not in res.headers:
+                # HTTP/1.0 clients do not support chunked bodies, so the end
+                # of the body can only be signaled by closing the connection
+                keep_alive = False
+        connection = None
+        if keep_alive:
+            if req.http_version == '1.0':
+                connection = 'keep-alive'
+        elif req.http_version == '1.1':
+            connection = 'close'
+        if connection:
+            if res.frozen is not None:
+                # the headers of a frozen response are shared
+                res.headers = NoCaseDict(res.headers)
+            res.headers['Connection'] = connection
+        return keep_alive
 
     def get_request_handlers(self, req, attr, local_first=True):
-        handlers = getattr(self, attr + '_handlers')
-        local_handlers = getattr(req.subapp, attr + '_handlers') \
-            if req and req.subapp else []
-        return local_handlers + handlers if local_first \
+        """Return the handlers of the given type that apply to a request, as
+        a tuple.
+
+        The combined tuple of application and sub-application handlers is
+        built once for each sub-application and reused until handlers are
+        registered or applications are mounted.
+        """
+        subapp = req.subapp if req else None
+        if self.handler_chains_version != Microdot.handlers_version:
+            self.handler_chains = {}
+            self.handler_chains_version = Microdot.handlers_version
+        key = (subapp, attr, local_first)
+        try:
+            return self.handler_chains[key]
+        except KeyError:
+            pass
+        handlers = tuple(getattr(self, attr + '_handlers'))
+        local_handlers = tuple(getattr(subapp, attr + '_handlers')) \
+            if subapp else ()
+        chain = local_handlers + handlers if local_first \
             else handlers + local_handlers
+        self.handler_chains[key] = chain
+        return chain
 
     async def error_response(self, req, status_code, reason=None):
         if req and req.subapp and status_code in req.subapp.error_handlers:
@@ -1399,6 +2335,9 @@ class Microdot:
                 req.subapp.error_handlers[status_code], req)
         elif status_code in self.error_handlers:
             return await invoke_handler(self.error_handlers[status_code], req)
+        res = self.error_responses.get((status_code, reason))
+        if res is not None:
+            return res
         return reason or 'N/A', status_code
 
     async def dispatch_request(self, req):
@@ -1452,10 +2391,13 @@ class Microdot:
                             # any other response types are wrapped in a
                             # Response object
                             res = Response(res)
-
+                        handlers = self.get_request_handlers(
+                            req, 'after_request', True)
+                        if res.frozen is not None:
+                            res = res._instance(
+                                handlers or req.after_request_handlers)
                         # invoke the after request handlers
-                        for handler in self.get_request_handlers(
-                                req, 'after_request', True):
+                        for handler in handlers:
                             res = await invoke_handler(
                                 handler, req, res) or res
                         for handler in req.after_request_handlers:
@@ -1517,8 +2459,11 @@ class Microdot:
         if not after_request_handled:
             # if the request did not finish due to an error, invoke the after
             # error request handler
-            for handler in self.get_request_handlers(
-                    req, 'after_error_request', True):
+            handlers = self.get_request_handlers(
+                req, 'after_error_request', True)
+            if res.frozen is not None:
+                res = res._instance(handlers)
+            for handler in handlers:
                 res = await invoke_handler(
                     handler, req, res) or res
         res.is_head = (req and req.method == 'HEAD')
@@ -1526,6 +2471,12 @@ class Microdot:
 
 
 Response.already_handled = Response()
+Microdot.error_responses = {
+    (status_code, reason): Response(reason, status_code).freeze()
+    for status_code, reason in [(400, 'Bad request'), (404, 'Not found'),
+                                (405, 'Not found'),
+                                (413, 'Payload too large'),
+                                (500, 'Internal server error')]}
 
 abort = Microdot.abort
 redirect = Response.redirect
@@ -25,15 +25,22 @@ class FormDataIter:
     :meth:`read() <FileUpload.read>` and :meth:`save() <FileUpload.save>`
     methods. Values for regular fields are provided as strings.
 
-    The request body is read efficiently in chunks of size
-    :attr:`buffer_size <FormDataIter.buffer_size>`. On iterations in which a
-    file field is encountered, the file must be consumed before moving on to
-    the next iteration, as the internal stream stored in ``FileUpload``
-    instances is invalidated at the end of the iteration.
+    The request body is read into a fixed buffer, which is scanned for the
+    part boundaries as data arrives. The size of the buffer adapts to the
+    length of the body, between :attr:`buffer_size <FormDataIter.buffer_size>`
+    and :attr:`max_buffer_size <FormDataIter.max_buffer_size>`. On iterations
+    in which a file field is encountered, the file must be consumed before
+    moving on to the next iteration, as the internal stream stored in
+    ``FileUpload`` instances is invalidated at the end of the iteration.
     """
-    #: The size of the buffer used to read chunks of the request body.
+    #: The minimum size of the buffer used to read chunks of the request
+    #: body.
     buffer_size = 256
 
+    #: The maximum size of the buffer used to read chunks of the request
+    #: body. Larger buffers need fewer reads to parse large uploads.
+    max_buffer_size = 4096
+
     def __init__(self, request):
         self.request = request
         self.buffer = None
@@ -43,9 +50,22 @@ class FormDataIter:
             return  # not a multipart request
         if mimetype.split(';', 1)[0] == \
                 'multipart/form-data':  # pragma: no branch
-            self.boundary = b'--' + boundary.encode()
-            self.extra_size = len(boundary) + 4
-            self.buffer = b''
+            # all the boundaries are matched with their leading line break,
+            # which the first one does not have, so one is added to the data
+            self.delimiter = b'\r\n--' + boundary.encode()
+            self.remaining = request.content_length or -1
+            size = self.max_buffer_size if self.remaining == -1 else \
+                min(max(self.remaining, self.buffer_size),
+                    self.max_buffer_size)
+            self.buffer = bytearray(size + len(self.delimiter) + 2)
+            self.view = memoryview(self.buffer)
+            self.view[:2] = b'\r\n'
+            self.start = 0
+            self.end = 2
+            self.part_done = False
+            stream = request.stream
+            self.readinto = getattr(stream, 'readinto', None)
+            self.read = stream.read
 
     def __aiter__(self):
         return self
@@ -55,31 +75,38 @@ class FormDataIter:
             raise StopAsyncIteration
 
         # make sure we have consumed the previous entry
-        while await self._read_buffer(self.buffer_size) != b'':
+        while await self._read_view():
             pass
 
         # make sure we are at a boundary
-        s = self.buffer.split(self.boundary, 1)
-        if len(s) != 2 or s[0] != b'':
+        n = len(self.delimiter)
+        if not await self._ensure(n + 2) or \
+                bytes(self.view[self.start:self.start + n]) != self.delimiter:
             abort(400)  # pragma: no cover
-        self.buffer = s[1]
-        if self.buffer[:2] == b'--':
+        self.start += n
+        end = bytes(self.view[self.start:self.start + 2])
+        if end == b'--':
             # we have reached the end
+            self.buffer = None
             raise StopAsyncIteration
-        elif self.buffer[:2] != b'\r\n':
+        elif end != b'\r\n':
             abort(400)  # pragma: no cover
-        self.buffer = self.buffer[2:]
+        self.start += 2
+        self.part_done = False
 
         # parse the headers of this part
         name = ''
         filename = None
         content_type = None
         while True:
-            await self._fill_buffer()
-            lines = self.buffer.split(b'\r\n', 1)
-            if len(lines) != 2:
-                abort(400)  # pragma: no cover
-            line, self.buffer = lines
+            pos = self._find(b'\r\n')
+            while pos == -1:
+                if self.end - self.start == len(self.buffer) or \
+                        not await self._fill():
+                    abort(400)  # pragma: no cover
+                pos = self._find(b'\r\n')
+            line = bytes(self.view[self.start:pos])
+            self.start = pos + 2
             if line == b'':
                 # we reached the end of the headers
                 break
@@ -101,34 +128,80 @@ class FormDataIter:
 
         if filename is None:
             # this is a regular form field, so we read the value
-            value = b''
-            while True:
-                v = await self._read_buffer(self.buffer_size)
-                value += v
-                if len(v) < self.buffer_size:  # pragma: no branch
+            return name, (await self._read_buffer()).decode()
+        return name, FileUpload(filename, content_type, self._read_buffer,
+                                self._read_view)
+
+    def _find(self, sub):
+        if hasattr(self.buffer, 'find'):
+            return self.buffer.find(sub, self.start, self.end)
+        # MicroPython's bytearray does not have a find() method
+        pos = bytes(self.view[self.start:self.end]).find(sub)
+        return pos + self.start if pos != -1 else -1
+
+    async def _fill(self):
+        # move the unprocessed data to the start of the buffer and read more
+        # data after it
+        n = self.end - self.start
+        if self.start:
+            self.view[:n] = self.view[self.start:self.end]
+            self.start = 0
+            self.end = n
+        if self.remaining == 0:
+            return False
+        size = len(self.buffer) - n
+        if self.remaining != -1 and self.remaining < size:
+            size = self.remaining
+        if self.readinto:
+            size = await self.readinto(self.view[n:n + size])
+        else:
+            data = await self.read(size)
+            size = len(data)
+            self.view[n:n + size] = data
+        if self.remaining != -1:
+            self.remaining -= size
+        self.end += size
+        return size > 0
+
+    async def _ensure(self, n):
+        while self.end - self.start < n:
+            if not await self._fill():
+                return False
+        return True
+
+    async def _read_view(self, n=-1):
+        # return up to n bytes of the current part as a view of the buffer,
+        # which is only valid until the next read
+        while not self.part_done:
+            pos = self._find(self.delimiter)
+            if pos == -1:
+                # the end of the data could be the start of the boundary, so
+                # it is not returned until more data is read
+                available = self.end - self.start - len(self.delimiter) + 1
+            else:
+                available = pos - self.start
+                if available == 0:
+                    self.part_done = True
                     break
-            return name, value.decode()
-        return name, FileUpload(filename, content_type, self._read_buffer)
-
-    async def _fill_buffer(self):
-        self.buffer += await self.request.stream.read(
-            self.buffer_size + self.extra_size - len(self.buffer))
+            if available > 0:
+                if n != -1 and n < available:
+                    available = n
+                self.start += available
+                return self.view[self.start - available:self.start]
+            if not await self._fill():
+                abort(400)  # pragma: no cover
+        return self.view[0:0]
 
     async def _read_buffer(self, n=-1):
-        data = b''
-        while n == -1 or len(data) < n:
-            await self._fill_buffer()
-            s = self.buffer.split(self.boundary, 1)
-            data += s[0][:n] if n != -1 else s[0]
-            self.buffer = s[0][n:] if n != -1 else b''
-            if len(s) == 2:  # pragma: no branch
-                # the end of this part is in the buffer
-                if len(self.buffer) < 2:
-                    # we have read all the way to the end of this part
-                    data = data[:-(2 - len(self.buffer))]  # remove last "\r\n"
-                self.buffer += self.boundary + s[1]
-                return data
-        return data
+        chunks = []
+        while n != 0:
+            data = await self._read_view(n)
+            if not data:
+                break
+            chunks.append(bytes(data))
+            if n != -1:
+                n -= len(data)
+        return b''.join(chunks)
 
 
 class FileUpload:
@@ -137,6 +210,8 @@ class FileUpload:
     :param filename: the name of the uploaded file.
     :param content_type: the content type of the uploaded file.
     :param read: a coroutine that reads from the uploaded file's stream.
+    :param read_view: an optional coroutine that returns the data of the
+                      uploaded file's stream as a temporary ``memoryview``.
 
     An uploaded file can be read from the stream using the :meth:`read()`
     method or saved to a file using the :meth:`save()` method.
@@ -146,10 +221,11 @@ class FileUpload:
     #: The size at which the file is copied to a temporary file.
     max_memory_size = 1024
 
-    def __init__(self, filename, content_type, read):
+    def __init__(self, filename, content_type, read, read_view=None):
         self.filename = filename
         self.content_type = content_type
         self._read = read
+        self._read_view = read_view
         self._close = None
 
     async def read(self, n=-1):
@@ -166,15 +242,18 @@ class FileUpload:
         :param path_or_file: the path to save the file to, or a file object
                              to which the file is to be written.
 
-        The file is read and written in chunks of size
-        :attr:`FormDataIter.buffer_size`.
+        The file is written in chunks directly from the buffer of the
+        multipart parser, without making copies of the data.
         """
         if isinstance(path_or_file, str):
             f = open(path_or_file, 'wb')
         else:
             f = path_or_file
         while True:
-            data = await self.read(FormDataIter.buffer_size)
+            if self._read_view:
+                data = await self._read_view()
+            else:
+                data = await self.read(FormDataIter.max_buffer_size)
             if not data:
                 break
             f.write(data)
@@ -194,6 +273,7 @@ class FileUpload:
         if len(buffer) < max_memory_size:
             f = AsyncBytesIO(buffer)
             self._read = f.read
+            self._read_view = None
             return self
 
         # create a temporary file
@@ -230,6 +310,7 @@ class FileUpload:
             os.remove(tmpname)
 
         self._read = read
+        self._read_view = None
         self._close = close
         return self
 
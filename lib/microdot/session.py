@@ -1,5 +1,5 @@
 import jwt
-from microdot.microdot import invoke_handler
+from microdot.microdot import invoke_handler, inline
 from microdot.helpers import wraps
 
 
@@ -92,6 +92,7 @@ class Session:
         encoded_session = self.encode(session)
 
         @request.after_request
+        @inline
         def _update_session(request, response):
             response.set_cookie('session', encoded_session,
                                 **self.cookie_options)
@@ -116,6 +117,7 @@ class Session:
         currently being processed.
         """
         @request.after_request
+        @inline
         def _delete_session(request, response):
             response.delete_cookie('session', **self.cookie_options)
             return response
@@ -1,10 +1,11 @@
 import asyncio
+from microdot.microdot import Response
 from microdot.helpers import wraps
 
 try:
-    import orjson as json
-except ImportError:
-    import json
+    from collections import deque
+except ImportError:  # pragma: no cover
+    from ucollections import deque
 
 
 class SSE:
@@ -13,9 +14,56 @@ class SSE:
     An object of this class is sent to handler functions to manage the SSE
     connection.
     """
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    COALESCE = 'coalesce'
+
+    #: The maximum number of events that can be waiting to be sent to the
+    #: client. The default is 16.
+    max_queue = 16
+
+    #: What to do when an event is sent while the queue is full. With
+    #: ``'block'`` (the default) ``send()`` waits until the client receives
+    #: some of the queued events. With ``'drop_oldest'`` the oldest queued
+    #: event is discarded. With ``'coalesce'``, a named event replaces the
+    #: queued event with the same name, if there is one, so that only the
+    #: latest value of each kind is sent, and the oldest event is discarded
+    #: when the queue is full.
+    #:
+    #: Events sent by a :class:`SSEChannel` never block, so with
+    #: ``'block'`` they discard the oldest event.
+    #:
+    #: Example::
+    #:
+    #:    SSE.overflow_policy = 'coalesce'
+    overflow_policy = BLOCK
+
+    #: The number of seconds without events after which a comment is sent to
+    #: keep the connection open. The default is 0, which disables the
+    #: heartbeat.
+    heartbeat_interval = 0
+
     def __init__(self):
         self.event = asyncio.Event()
-        self.queue = []
+        self.space = asyncio.Event()
+        # one extra slot is used to pass an exception from the handler
+        self.queue = deque((), self.max_queue + 1)
+        self.latest = {}
+        #: The highest number of events that were waiting to be sent.
+        self.max_depth = 0
+        #: The number of events that were discarded because the queue was
+        #: full.
+        self.dropped = 0
+        #: The number of events that replaced a queued event with the same
+        #: name.
+        self.coalesced = 0
+        #: The number of heartbeat comments that were sent.
+        self.heartbeats = 0
+
+    @property
+    def depth(self):
+        """The number of events that are waiting to be sent."""
+        return len(self.queue)
 
     async def send(self, data, event=None, event_id=None):
         """Send an event to the client.
@@ -28,8 +76,21 @@ class SSE:
         :param event_id: an optional event id, to send along with the data. If
                       given, it must be a string.
         """
+        data = self.encode(data, event=event, event_id=event_id)
+        if self.overflow_policy == self.BLOCK:
+            await self._wait_for_space()
+        self._put(data, event)
+
+    @staticmethod
+    def encode(data, event=None, event_id=None):
+        """Encode an event in the format used in the event stream.
+
+        The arguments are the same as in :meth:`send`. The result can be given
+        to :meth:`send_encoded` to send the same event to many clients without
+        encoding it again.
+        """
         if isinstance(data, (dict, list)):
-            data = json.dumps(data)
+            data = Response.json_serializer(data)
         if isinstance(data, str):
             data = data.encode()
         elif not isinstance(data, bytes):
@@ -39,9 +100,149 @@ class SSE:
             data = b'id: ' + event_id.encode() + b'\n' + data
         if event:
             data = b'event: ' + event.encode() + b'\n' + data
+        return data
+
+    async def send_encoded(self, data):
+        """Send an event that was encoded with :meth:`encode`.
+
+        :param data: the encoded event.
+        """
+        if self.overflow_policy == self.BLOCK:
+            await self._wait_for_space()
+        self._put(data)
+
+    async def _wait_for_space(self):
+        while len(self.queue) >= self.max_queue:
+            self.space.clear()
+            await self.space.wait()
+
+    def _put(self, data, name=None):
+        if self.overflow_policy == self.COALESCE and name:
+            if name in self.latest:
+                self.latest[name] = data
+                self.coalesced += 1
+                return
+            # the queue holds the name, and the event is taken from the
+            # latest dictionary when it is sent
+            self.latest[name] = data
+            data = name
+        if len(self.queue) >= self.max_queue:
+            self._get()
+            self.dropped += 1
         self.queue.append(data)
+        if len(self.queue) > self.max_depth:
+            self.max_depth = len(self.queue)
         self.event.set()
 
+    def _get(self):
+        data = self.queue.popleft()
+        self.space.set()
+        if isinstance(data, str):
+            data = self.latest.pop(data)
+        return data
+
+
+class SSEChannel:
+    """Broadcast Server-Sent Events to a group of clients.
+
+    :param history: the number of recent events that are kept to be sent
+                    again to clients that reconnect.
+
+    Each event is encoded once and the encoded event is shared by all the
+    clients. When a client reconnects after losing its connection, the
+    browser sends the id of the last event it received in the
+    ``Last-Event-ID`` header, and the events that it missed are sent to it
+    again, as long as they are still in the history. Example::
+
+        channel = SSEChannel()
+
+        @app.route('/events')
+        @with_sse
+        async def events(request, sse):
+            await channel.serve(request, sse)
+
+        async def producer():
+            while True:
+                await channel.send({'adc': adc.read()})
+                await asyncio.sleep(0.2)
+    """
+    def __init__(self, history=16):
+        self.clients = set()
+        self.history = [None] * history
+        #: The number of events sent through the channel.
+        self.count = 0
+
+    def __len__(self):
+        return len(self.clients)
+
+    async def send(self, data, event=None, event_id=None):
+        """Send an event to all the clients in the channel.
+
+        :param data: the data to send, as in :meth:`SSE.send`.
+        :param event: an optional event name.
+        :param event_id: an optional event id. If not given, events are
+                         numbered in the order they are sent.
+        """
+        self.count += 1
+        if event_id is None:
+            event_id = str(self.count)
+        data = SSE.encode(data, event=event, event_id=event_id)
+        if self.history:
+            self.history[self.count % len(self.history)] = (event_id, data)
+        for sse in self.clients:
+            sse._put(data, event)
+
+    def subscribe(self, sse, last_event_id=None):
+        """Add a client to the channel.
+
+        :param sse: the SSE object of the client.
+        :param last_event_id: the id of the last event received by the
+                              client. The events in the history that come
+                              after it are sent to the client. If the id is
+                              not in the history, all the events in it are
+                              sent.
+        """
+        if last_event_id is not None:
+            events = self._replay(last_event_id)
+            for data in events:
+                sse._put(data)
+        self.clients.add(sse)
+
+    def unsubscribe(self, sse):
+        """Remove a client from the channel.
+
+        :param sse: the SSE object of the client.
+        """
+        self.clients.discard(sse)
+
+    async def serve(self, request, sse):
+        """Send the events of the channel to a client until it
+        disconnects.
+
+        :param request: the request object.
+        :param sse: the SSE object of the client.
+
+        Events missed by a reconnecting client are sent first.
+        """
+        self.subscribe(sse, request.headers.get('Last-Event-ID'))
+        try:
+            # the task is cancelled when the client goes away
+            await asyncio.Event().wait()
+        finally:
+            self.unsubscribe(sse)
+
+    def _replay(self, last_event_id):
+        size = len(self.history)
+        # the events in the history, from oldest to newest
+        events = [self.history[i % size]
+                  for i in range(self.count - min(self.count, size) + 1,
+                                 self.count + 1)]
+        for i in range(len(events) - 1, -1, -1):
+            if events[i][0] == last_event_id:
+                events = events[i + 1:]
+                break
+        return [data for _, data in events]
+
 
 def sse_response(request, event_function, *args, **kwargs):
     """Return a response object that initiates an event stream.
@@ -81,10 +282,19 @@ def sse_response(request, event_function, *args, **kwargs):
             event = None
             while sse.queue or not task.done():
                 try:
-                    event = sse.queue.pop(0)
+                    event = sse._get()
                     break
                 except IndexError:
-                    await sse.event.wait()
+                    if sse.heartbeat_interval:
+                        try:
+                            await asyncio.wait_for(
+                                sse.event.wait(), sse.heartbeat_interval)
+                        except asyncio.TimeoutError:
+                            # a comment line, which clients ignore
+                            sse.heartbeats += 1
+                            return b':\n\n'
+                    else:
+                        await sse.event.wait()
                     sse.event.clear()
             if isinstance(event, Exception):
                 # if the event is an exception we re-raise it here so that it
@@ -0,0 +1,484 @@
+import io
+import os
+import random
+import time
+from microdot.microdot import Response
+
+try:
+    from collections import OrderedDict
+except ImportError:  # pragma: no cover
+    from ucollections import OrderedDict
+
+try:
+    from gzip import compress as gzip_compress
+except ImportError:  # pragma: no cover
+    try:
+        import deflate
+
+        def gzip_compress(data):
+            stream = io.BytesIO()
+            with deflate.DeflateIO(stream, deflate.GZIP) as f:
+                f.write(data)
+            return stream.getvalue()
+    except ImportError:
+        gzip_compress = None
+
+
+def http_date(t):
+    """Format a timestamp as an HTTP date, such as the one used in the
+    ``Last-Modified`` header."""
+    year, month, day, hour, minute, second, weekday = time.gmtime(t)[:7]
+    return '{}, {:02d} {} {} {:02d}:{:02d}:{:02d} GMT'.format(
+        ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')[weekday], day,
+        ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct',
+         'Nov', 'Dec')[month - 1], year, hour, minute, second)
+
+
+def _add_vary(response, header):
+    vary = response.headers.get('Vary')
+    if not vary:
+        response.headers['Vary'] = header
+    elif header.lower() not in vary.lower():
+        response.headers['Vary'] = vary + ', ' + header
+
+
+class FileCache:
+    """An in-memory cache for the contents of small files sent with
+    :meth:`Response.send_file() <microdot.Response.send_file>`.
+
+    :param max_size: The total number of bytes that can be stored in the
+                     cache. When this size is exceeded, the least recently
+                     used files are evicted.
+    :param max_file_size: The size of the largest file that is stored in the
+                          cache.
+
+    Files are stored along with their size and modification time, and a
+    cached file is discarded when it is found to have changed on disk.
+
+    Example::
+
+        from microdot.static import StaticFiles, FileCache
+
+        StaticFiles(app, cache=FileCache(max_size=32 * 1024))
+    """
+    def __init__(self, max_size=16 * 1024, max_file_size=4 * 1024):
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+        self.size = 0
+        self.files = OrderedDict()
+
+    def get(self, path, version):
+        """Return the cached contents of a file, or ``None`` if the file is
+        not in the cache.
+
+        :param path: The path of the file.
+        :param version: The size and modification time of the file on disk.
+        """
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return None
+        if entry[0] != version:
+            # the file changed since it was cached
+            self.size -= len(entry[1])
+            return None
+        self.files[path] = entry  # move to the most recently used position
+        return entry[1]
+
+    def put(self, path, version, data):
+        """Add the contents of a file to the cache.
+
+        :param path: The path of the file.
+        :param version: The size and modification time of the file on disk.
+        :param data: The contents of the file.
+        """
+        if len(data) > self.max_file_size or len(data) > self.max_size:
+            return
+        entry = self.files.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+        while self.size + len(data) > self.max_size:
+            oldest = next(iter(self.files))
+            self.size -= len(self.files.pop(oldest)[1])
+        self.files[path] = (version, data)
+        self.size += len(data)
+
+    def clear(self):
+        """Remove all the files from the cache."""
+        self.files = OrderedDict()
+        self.size = 0
+
+
+class StaticFiles:
+    """Add validators, conditional requests, content encoding negotiation
+    and support for range requests to the files sent with
+    :meth:`Response.send_file() <microdot.Response.send_file>`.
+
+    :param app: The application instance.
+    :param cache: A :class:`FileCache` instance that keeps the contents of
+                  small files in memory. The default is ``None``, which
+                  disables caching.
+    :param precompressed: The precompressed variants to look for next to the
+                          requested file, as a list of
+                          ``(encoding, extension)`` tuples in order of
+                          preference, for example
+                          ``[('br', '.br'), ('gzip', '.gz')]``. When a
+                          variant exists and the client accepts its encoding,
+                          the variant is sent instead of the requested file.
+                          Variants that are older than the requested file are
+                          ignored. The default is to not look for variants.
+    :param compress_min_size: The minimum size of a text file that is
+                              compressed with gzip when it does not have a
+                              precompressed variant and the client accepts
+                              gzip. The default is ``None``, which disables
+                              compression.
+    :param compress_max_size: The maximum size of a text file that is
+                              compressed. Compression is done in memory, so
+                              this size should be adjusted to the memory
+                              available on the device.
+    :param compressible_types: The content types that are compressed, in
+                               addition to all the ``text/*`` types. The
+                               default is JavaScript, JSON and SVG.
+    :param max_ranges: The maximum number of ranges accepted in the ``Range``
+                       header of a request. Requests that ask for more ranges
+                       receive the complete file.
+
+    Example::
+
+        from microdot import Microdot
+        from microdot.static import StaticFiles
+
+        app = Microdot()
+        StaticFiles(app, precompressed=[('gzip', '.gz')])
+    """
+    def __init__(self, app=None, cache=None, precompressed=None,
+                 compress_min_size=None, compress_max_size=32 * 1024,
+                 compressible_types=None, max_ranges=8):
+        self.cache = cache
+        self.precompressed = precompressed or []
+        self.compress_min_size = compress_min_size
+        self.compress_max_size = compress_max_size
+        self.compressible_types = compressible_types or [
+            'application/javascript', 'application/json', 'image/svg+xml']
+        self.max_ranges = max_ranges
+        if app is not None:
+            self.initialize(app)
+
+    def initialize(self, app):
+        """Initialize the static files support for the given application.
+
+        :param app: The application instance.
+
+        The files sent with ``send_file()`` are loaded by this object in all
+        the applications, not only in the given one.
+        """
+        Response.file_loader = self.load_file
+        app.after_request(self.after_request)
+
+    def load_file(self, response, path):
+        """Load a file sent with ``send_file()`` into a response.
+
+        :param response: The response object.
+        :param path: The path of the file.
+
+        The ``Content-Length``, ``ETag`` and ``Last-Modified`` headers are
+        computed from the size and modification time of the file, and small
+        files are served from the cache when there is one.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            response.body = open(path, 'rb')
+            return
+        self._load_file(response, path, st)
+        if 'Content-Encoding' not in response.headers:
+            # the content encoding can be negotiated with the client
+            response.file_path = path
+
+    def _load_file(self, response, path, st, encoding=None):
+        size, mtime = st[6], int(st[8])
+        response.headers['Content-Length'] = str(size)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['ETag'] = '"{:x}-{:x}{}"'.format(
+            mtime, size, '-' + encoding if encoding else '')
+        response.headers['Last-Modified'] = http_date(mtime)
+        cache = self.cache
+        if cache is not None and size <= cache.max_file_size:
+            body = cache.get(path, (size, mtime))
+            if body is None:
+                with open(path, 'rb') as f:
+                    body = f.read()
+                cache.put(path, (size, mtime), body)
+            response.body = body
+        else:
+            response.body = open(path, 'rb')
+            response.send_file_buffer_size = max(
+                min(response.send_file_buffer_size, size), 1)
+
+    def after_request(self, request, response):
+        if request.method not in ['GET', 'HEAD'] or \
+                response == Response.already_handled:
+            return
+        if response.file_path is not None and (
+                self.precompressed or self.compress_min_size is not None):
+            self.negotiate_encoding(request, response)
+        self.make_conditional(request, response)
+        if request.method == 'GET':
+            self.make_range(request, response)
+
+    def make_conditional(self, request, response):
+        """Convert a response to a ``304 Not Modified`` response if the
+        client already has the current version of the resource.
+
+        :param request: The request object.
+        :param response: The response object.
+
+        The ``If-None-Match`` header sent by the client is compared against
+        the ``ETag`` header of the response. When the client does not send
+        this header, the ``If-Modified-Since`` header is compared against the
+        ``Last-Modified`` header. This method is invoked automatically for
+        successful ``GET`` and ``HEAD`` requests.
+        """
+        if response.status_code != 200:
+            return
+        etag = response.headers.get('ETag')
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            if etag is None:
+                return
+            # weak comparison, in which the W/ prefix of weak tags is ignored
+            tags = [t.strip() for t in if_none_match.split(',')]
+            tags = [t[2:] if t.startswith('W/') else t for t in tags]
+            if '*' not in tags and (
+                    etag[2:] if etag.startswith('W/') else etag) not in tags:
+                return
+        else:
+            last_modified = response.headers.get('Last-Modified')
+            if last_modified is None or last_modified != \
+                    request.headers.get('If-Modified-Since'):
+                return
+        if hasattr(response.body, 'close'):
+            response.body.close()
+        response.status_code = 304
+        response.reason = None
+        response.body = b''
+
+    def negotiate_encoding(self, request, response):
+        """Select the content encoding of a file response according to the
+        ``Accept-Encoding`` header sent by the client.
+
+        :param request: The request object.
+        :param response: The response object.
+
+        If the file has a precompressed variant that the client accepts, the
+        variant is sent instead. If not, text files can be compressed on the
+        fly. This method is invoked automatically for ``GET`` and ``HEAD``
+        requests when variants or compression are configured, and has no
+        effect on responses that were not created by ``send_file()``.
+        """
+        if response.file_path is None or response.status_code != 200 or \
+                'Content-Encoding' in response.headers:
+            return
+        accepted = []
+        for coding in request.headers.get('Accept-Encoding', '').split(','):
+            params = coding.split(';')
+            q = 1
+            for param in params[1:]:
+                param = param.strip()
+                if param.startswith('q='):
+                    try:
+                        q = float(param[2:])
+                    except ValueError:
+                        q = 0
+            if q > 0:
+                accepted.append(params[0].strip().lower())
+        selected = None
+        mtime = None
+        for encoding, extension in self.precompressed:
+            try:
+                st = os.stat(response.file_path + extension)
+                if mtime is None:
+                    mtime = os.stat(response.file_path)[8]
+            except OSError:
+                continue
+            if st[8] < mtime:
+                # the variant was not regenerated after the file changed
+                continue
+            _add_vary(response, 'Accept-Encoding')
+            if selected is None and (encoding in accepted or
+                                     '*' in accepted):
+                selected = (encoding, response.file_path + extension, st)
+        if selected:
+            if hasattr(response.body, 'close'):
+                response.body.close()
+            encoding, path, st = selected
+            self._load_file(response, path, st, encoding)
+            response.headers['Content-Encoding'] = encoding
+            return
+
+        if self.compress_min_size is None or gzip_compress is None:
+            return
+        content_type = response.headers.get('Content-Type', '').split(';')[0]
+        if not content_type.startswith('text/') and \
+                content_type not in self.compressible_types:
+            return
+        size = int(response.headers['Content-Length'])
+        if size < self.compress_min_size or size > self.compress_max_size:
+            return
+        _add_vary(response, 'Accept-Encoding')
+        if 'gzip' not in accepted and '*' not in accepted:
+            return
+        cache = self.cache
+        etag = response.headers['ETag']
+        key = response.file_path + ':gzip'
+        data = cache.get(key, etag) if cache is not None else None
+        if data is None:
+            if isinstance(response.body, bytes):
+                data = response.body
+            else:
+                data = response.body.read()
+                response.body.close()
+            try:
+                data = gzip_compress(data)
+            except OSError:  # pragma: no cover
+                # compression is not available in this MicroPython build
+                response.body = data
+                return
+            if cache is not None:
+                cache.put(key, etag, data)
+        elif not isinstance(response.body, bytes):
+            response.body.close()
+        response.body = data
+        response.headers['Content-Length'] = str(len(data))
+        response.headers['ETag'] = etag[:-1] + '-gzip"'
+        response.headers['Content-Encoding'] = 'gzip'
+
+    def make_range(self, request, response):
+        """Convert a response to a ``206 Partial Content`` response with the
+        ranges of the file requested by the client in the ``Range`` header.
+
+        :param request: The request object.
+        :param response: The response object.
+
+        A single range is returned as the body of the response, while
+        multiple ranges are returned as a ``multipart/byteranges`` body. When
+        the client sends an ``If-Range`` header that does not match the
+        ``ETag`` or ``Last-Modified`` headers of the response, the complete
+        file is returned. Requests for ranges that are outside of the file
+        receive a ``416 Range Not Satisfiable`` response. This method is
+        invoked automatically for ``GET`` requests, and has no effect on
+        responses that do not have an ``Accept-Ranges: bytes`` header.
+        """
+        range_header = request.headers.get('Range')
+        if range_header is None or response.status_code != 200 or \
+                response.headers.get('Accept-Ranges') != 'bytes':
+            return
+        if_range = request.headers.get('If-Range')
+        if if_range is not None and (
+                if_range.startswith('W/') or
+                if_range not in [response.headers.get('ETag'),
+                                 response.headers.get('Last-Modified')]):
+            return
+        body = response.body
+        if isinstance(body, bytes):
+            size = len(body)
+        elif 'Content-Length' in response.headers and hasattr(body, 'seek'):
+            size = int(response.headers['Content-Length'])
+        else:
+            # the size of the body is unknown, or it cannot be seeked
+            return
+        ranges = self._parse_ranges(range_header, size)
+        if ranges is None:
+            return
+        if not ranges:
+            if hasattr(body, 'close'):
+                body.close()
+            response.status_code = 416
+            response.body = b''
+            response.headers['Content-Range'] = 'bytes */{}'.format(size)
+            response.headers['Content-Length'] = '0'
+            return
+        response.status_code = 206
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+                start, end, size)
+            response.headers['Content-Length'] = str(end - start + 1)
+            if isinstance(body, bytes):
+                response.body = body[start:end + 1]
+            else:
+                response.body = self._range_body(
+                    body, [(None, start, end)], response.send_file_buffer_size)
+            return
+
+        boundary = '{:08x}{:08x}'.format(random.getrandbits(32),
+                                         random.getrandbits(32))
+        content_type = response.headers.get('Content-Type',
+                                            'application/octet-stream')
+        parts = []
+        length = len(boundary) + 6  # closing delimiter
+        for start, end in ranges:
+            part_header = ('--{}\r\nContent-Type: {}\r\n'
+                           'Content-Range: bytes {}-{}/{}\r\n\r\n').format(
+                boundary, content_type, start, end, size).encode()
+            parts.append((part_header, start, end))
+            length += len(part_header) + end - start + 3
+        parts.append(('--' + boundary + '--\r\n').encode())
+        response.headers['Content-Type'] = \
+            'multipart/byteranges; boundary=' + boundary
+        response.headers['Content-Length'] = str(length)
+        response.body = self._range_body(body, parts,
+                                         response.send_file_buffer_size)
+
+    def _parse_ranges(self, range_header, size):
+        unit, ranges_spec = (range_header.split('=', 1) + [''])[:2]
+        if unit.strip().lower() != 'bytes':
+            return None
+        ranges = []
+        for spec in ranges_spec.split(','):
+            if '-' not in spec:
+                return None
+            first, last = [s.strip() for s in spec.split('-', 1)]
+            try:
+                if first == '':
+                    # suffix range with the last bytes of the file
+                    start = max(size - int(last), 0)
+                    end = size - 1
+                else:
+                    start = int(first)
+                    end = min(int(last), size - 1) if last else size - 1
+                    if last and int(last) < start:
+                        return None
+            except ValueError:
+                return None
+            if start < 0 or start > end:
+                continue  # this range cannot be satisfied
+            ranges.append((start, end))
+        if len(ranges) > self.max_ranges:
+            return None
+        return ranges
+
+    def _range_body(self, body, parts, buffer_size):
+        try:
+            for part in parts:
+                if isinstance(part, bytes):
+                    yield part
+                    continue
+                part_header, start, end = part
+                if part_header:
+                    yield part_header
+                if isinstance(body, bytes):
+                    yield body[start:end + 1]
+                else:
+                    body.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        data = body.read(min(buffer_size, remaining))
+                        if not data:  # pragma: no cover
+                            break
+                        remaining -= len(data)
+                        yield data
+                if part_header:
+                    yield b'\r\n'
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
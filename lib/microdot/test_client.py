@@ -170,12 +170,12 @@ class TestClient:
         return headers
 
     def _render_request(self, method, path, headers, body):
-        request_bytes = '{method} {path} HTTP/1.0\n'.format(
+        request_bytes = '{method} {path} HTTP/1.0\r\n'.format(
             method=method, path=path)
         for header, value in headers.items():
-            request_bytes += '{header}: {value}\n'.format(
+            request_bytes += '{header}: {value}\r\n'.format(
                 header=header, value=value)
-        request_bytes = request_bytes.encode() + b'\n' + body
+        request_bytes = request_bytes.encode() + b'\r\n' + body
         return request_bytes
 
     def _update_cookies(self, res):
@@ -319,6 +319,9 @@ class TestClient:
                 self.started = False
                 self.closed = False
                 self.buffer = b''
+                self.opcode = None
+                self.message = b''
+                self.pending = b''
 
             async def _next(self, data=None):
                 try:
@@ -352,16 +355,37 @@ class TestClient:
                         break
                 return line
 
+            def write(self, data):
+                self.pending += bytes(data)
+
+            async def drain(self):
+                if self.pending:
+                    await self.awrite(b'')
+
             async def awrite(self, data):
+                # a frame can be given in several calls to write() followed
+                # by a call to awrite() or drain()
+                data = self.pending + bytes(data)
+                self.pending = b''
                 if self.started:
                     h = WebSocket._parse_frame_header(data[0:2])
-                    if h[1] not in [WebSocket.TEXT, WebSocket.BINARY]:
+                    if h[1] not in [WebSocket.TEXT, WebSocket.BINARY,
+                                    WebSocket.CONT]:
                         return
                     if h[3] < 0:
                         data = data[2 - h[3]:]
                     else:
                         data = data[2:]
-                    if h[1] == WebSocket.TEXT:
+                    if h[1] != WebSocket.CONT:
+                        self.opcode = h[1]
+                        self.message = bytes(data)
+                    else:
+                        self.message += data
+                    if not h[0]:
+                        # wait for the remaining frames of the message
+                        return
+                    data = self.message
+                    if self.opcode == WebSocket.TEXT:
                         data = data.decode()
                     self.buffer = await self._next(data)
 
@@ -0,0 +1,21 @@
+"""
+microdot.viper
+--------------
+
+Routines compiled with the MicroPython ``viper`` code emitter. This module
+can only be imported on MicroPython builds that include the emitter.
+"""
+import micropython
+
+
+@micropython.viper
+def unmask(buf, mask):
+    """XOR the contents of a bytearray in place with a 4-byte WebSocket
+    mask."""
+    b = ptr8(buf)  # noqa: F821
+    m = ptr8(mask)  # noqa: F821
+    n = int(len(buf))
+    i = 0
+    while i < n:
+        b[i] = b[i] ^ m[i & 3]
+        i += 1
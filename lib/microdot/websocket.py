@@ -1,9 +1,32 @@
+import asyncio
 import binascii
 import hashlib
+import time
 from microdot import Request, Response
-from microdot.microdot import MUTED_SOCKET_ERRORS, print_exception
+from microdot.microdot import MUTED_SOCKET_ERRORS, print_exception, \
+    iscoroutine
 from microdot.helpers import wraps
 
+try:
+    import zlib
+except ImportError:  # pragma: no cover
+    zlib = None
+
+try:
+    from microdot.viper import unmask as viper_unmask
+except Exception:  # pragma: no cover
+    # not running on MicroPython, or the viper emitter is not available
+    viper_unmask = None
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
 
 class WebSocketError(Exception):
     """Exception raised when an error occurs in a WebSocket connection."""
@@ -35,28 +58,163 @@ class WebSocket:
     #:    WebSocket.max_message_length = 4 * 1024  # up to 4KB messages
     max_message_length = -1
 
+    #: Specify the maximum payload size of the frames sent by ``send()``.
+    #: Messages that are larger are sent in multiple frames of this size. Set
+    #: to 0 to always send messages in a single frame. The default is 0.
+    #:
+    #: Example::
+    #:
+    #:    WebSocket.max_frame_size = 4 * 1024  # up to 4KB frames
+    max_frame_size = 0
+
+    #: Specify if messages are compressed with the ``permessage-deflate``
+    #: extension (RFC 7692) when the client supports it. Compression requires
+    #: the ``zlib.compressobj()`` function, which is not available in
+    #: MicroPython. The default is ``False``.
+    #:
+    #: Example::
+    #:
+    #:    WebSocket.compression = True
+    compression = False
+
+    #: Specify the minimum size of the messages that are compressed. Smaller
+    #: messages are sent uncompressed. The default is 64 bytes.
+    compression_threshold = 64
+
+    #: Specify if the compression context is kept between messages. Keeping
+    #: it improves the compression of similar messages, at the cost of
+    #: holding the compressor and decompressor of each connection in memory.
+    #: When set to ``False``, the server asks the client to reset its
+    #: context after each message as well. The default is ``True``.
+    compression_context_takeover = True
+
+    #: Specify the compression level used with ``permessage-deflate``, from
+    #: 1 (fastest) to 9 (smallest). The default is 6.
+    compression_level = 6
+
+    #: A :class:`WebSocketHeartbeat` object that sends pings to all the
+    #: WebSocket connections and closes the ones that stop responding. The
+    #: default is ``None``, which disables the heartbeat.
+    #:
+    #: Example::
+    #:
+    #:    WebSocket.heartbeat = WebSocketHeartbeat(interval=20, timeout=10)
+    heartbeat = None
+
+    #: Specify the maximum size of the buffer that each connection uses to
+    #: encode frames. Frames that fit in the buffer are copied into it and
+    #: written in a single call. Larger frames are written as a full buffer
+    #: with the header and the start of the payload, followed by the rest of
+    #: the payload, which is not copied. The buffer is allocated at the size
+    #: of the largest frame sent, up to this size. The default of 1460 bytes
+    #: is roughly the payload of a TCP segment, so that frame headers are not
+    #: sent in segments of their own.
+    frame_buffer_size = 1460
+
     def __init__(self, request):
         self.request = request
         self.closed = False
+        self.write_lock = asyncio.Lock()
+        self.read_lock = asyncio.Lock()
+        #: ``True`` if messages are compressed with ``permessage-deflate``.
+        self.compressed = False
+        self.compressor = None
+        self.decompressor = None
+        self.server_takeover = True
+        self.client_takeover = True
+        self.server_wbits = 15
+        #: The number of payload bytes sent with ``send()``, before
+        #: compression.
+        self.sent_payload_bytes = 0
+        #: The number of bytes written by ``send()``, including frame headers.
+        self.sent_wire_bytes = 0
+        self.ping_sent = None
+        self.last_ping = 0
+        self.frame_buffer = None
+        # set while a message returned by receive_stream() is being read
+        self.streaming = False
+        # frames read by the heartbeat that the application has not read yet
+        self.unread = b''
 
     async def handshake(self):
         response = self._handshake_response()
+        extensions = self._negotiate_compression()
         await self.request.sock[1].awrite(
-            b'HTTP/1.1 101 Switching Protocols\r\n')
-        await self.request.sock[1].awrite(b'Upgrade: websocket\r\n')
-        await self.request.sock[1].awrite(b'Connection: Upgrade\r\n')
-        await self.request.sock[1].awrite(
+            b'HTTP/1.1 101 Switching Protocols\r\n'
+            b'Upgrade: websocket\r\n'
+            b'Connection: Upgrade\r\n' +
+            (b'Sec-WebSocket-Extensions: ' + extensions.encode() + b'\r\n'
+             if extensions else b'') +
             b'Sec-WebSocket-Accept: ' + response + b'\r\n\r\n')
+        if self.heartbeat:
+            self.heartbeat.register(self)
 
     async def receive(self):
-        """Receive a message from the client."""
-        while True:
-            opcode, payload = await self._read_frame()
-            send_opcode, data = self._process_websocket_frame(opcode, payload)
-            if send_opcode:  # pragma: no cover
-                await self.send(data, send_opcode)
-            elif data:  # pragma: no branch
-                return data
+        """Receive a message from the client.
+
+        Messages that the client sends in multiple frames are reassembled
+        before they are returned.
+        """
+        async with self.read_lock:
+            opcode = None
+            message = None
+            compressed = False
+            while True:
+                fin, frame_opcode, payload, rsv1 = await self._read_frame(
+                    len(message) if message else 0)
+                if frame_opcode >= self.CLOSE:
+                    # control frames can arrive between the frames of a message
+                    await self._process_control_frame(frame_opcode, payload)
+                    continue
+                if frame_opcode == self.CONT:
+                    if message is None:  # pragma: no cover
+                        raise WebSocketError('Unexpected continuation frame')
+                    message += payload
+                elif message is not None:  # pragma: no cover
+                    raise WebSocketError('Expected continuation frame')
+                else:
+                    opcode = frame_opcode
+                    message = payload if fin else bytearray(payload)
+                    compressed = rsv1
+                if not fin:
+                    continue
+                message = bytes(message)
+                if compressed:
+                    message = self._decompress(message)
+                _, data = self._process_websocket_frame(opcode, message)
+                if data:  # pragma: no branch
+                    return data
+                opcode = None
+                message = None
+
+    async def receive_stream(self, chunk_size=1024):
+        """Receive a message from the client in chunks.
+
+        :param chunk_size: the maximum size of the chunks.
+
+        This method returns a :class:`WebSocketMessage` object, which is an
+        asynchronous iterator that returns the payload of the message in
+        chunks, as bytes. The message does not need to fit in memory, and is
+        not limited by ``max_message_length``. The message must be read in
+        full before another one is received. Example::
+
+            message = await ws.receive_stream()
+            with open('upload.bin', 'wb') as f:
+                async for chunk in message:
+                    f.write(chunk)
+        """
+        async with self.read_lock:
+            while True:
+                fin, opcode, length, mask, rsv1 = \
+                    await self._read_frame_header()
+                if opcode >= self.CLOSE:
+                    await self._process_control_frame(
+                        opcode, await self._read_payload(length, mask))
+                    continue
+                if opcode == self.CONT:  # pragma: no cover
+                    raise WebSocketError('Unexpected continuation frame')
+                return WebSocketMessage(self, fin, opcode, length, mask,
+                                        chunk_size, rsv1)
 
     async def send(self, data, opcode=None):
         """Send a message to the client.
@@ -65,18 +223,152 @@ class WebSocket:
         :param opcode: a custom frame opcode to use. If not given, the opcode
                        is ``TEXT`` or ``BINARY`` depending on the type of the
                        data.
+
+        Messages that are larger than ``max_frame_size`` are sent in multiple
+        frames.
+        """
+        opcode = opcode or (
+            self.TEXT if isinstance(data, str) else self.BINARY)
+        if isinstance(data, str):
+            data = data.encode()
+        self.sent_payload_bytes += len(data)
+        rsv1 = False
+        if self.compressed and opcode < self.CLOSE and \
+                len(data) >= self.compression_threshold:
+            data = self._compress(data)
+            rsv1 = True
+        n = self.max_frame_size
+        if n and len(data) > n and opcode < self.CLOSE:
+            view = memoryview(data)
+            it = iter([view[i:i + n] for i in range(0, len(data), n)])
+
+            async def next_chunk():
+                return next(it, None)
+
+            await self._send_chunks(next_chunk, opcode, rsv1)
+            return
+        async with self.write_lock:
+            await self._write_frame(opcode, data, True, rsv1)
+
+    async def send_stream(self, source, opcode=None, frame_size=None):
+        """Send a message to the client in multiple frames.
+
+        :param source: the data to send, given as a file-like object with a
+                       ``read()`` method, or as an iterable or asynchronous
+                       iterable of strings or bytes.
+        :param opcode: the opcode of the message, ``TEXT`` or ``BINARY``. The
+                       default is ``BINARY``.
+        :param frame_size: the size of the frames read from file-like
+                           objects. The default is ``max_frame_size``, or 4KB
+                           when that is not set.
+
+        Each chunk of data is sent in its own frame, so only one or two chunks
+        are held in memory at a time. Example::
+
+            with open('image.gif', 'rb') as f:
+                await ws.send_stream(f)
         """
-        frame = self._encode_websocket_frame(
-            opcode or (self.TEXT if isinstance(data, str) else self.BINARY),
-            data)
-        await self.request.sock[1].awrite(frame)
+        opcode = opcode or self.BINARY
+        frame_size = frame_size or self.max_frame_size or 4096
+        if hasattr(source, 'read'):
+            async def next_chunk():
+                data = source.read(frame_size)
+                if iscoroutine(data):  # pragma: no cover
+                    data = await data
+                return data or None
+        elif hasattr(source, '__aiter__'):  # pragma: no cover
+            it = source.__aiter__()
+
+            async def next_chunk():
+                try:
+                    return await it.__anext__()
+                except StopAsyncIteration:
+                    return None
+        else:
+            it = iter(source)
+
+            async def next_chunk():
+                try:
+                    return next(it)
+                except StopIteration:
+                    return None
+
+        await self._send_chunks(next_chunk, opcode)
+
+    async def _send_chunks(self, next_chunk, opcode, rsv1=False):
+        # the frames of a message cannot be interleaved with other messages
+        async with self.write_lock:
+            chunk = await next_chunk()
+            while True:
+                next_data = await next_chunk()
+                while next_data is not None and len(next_data) == 0:
+                    next_data = await next_chunk()
+                fin = not next_data
+                await self._write_frame(opcode, chunk or b'', fin, rsv1)
+                if fin:
+                    break
+                opcode = self.CONT
+                rsv1 = False
+                chunk = next_data
 
     async def close(self):
         """Close the websocket connection."""
+        if self.heartbeat:
+            self.heartbeat.unregister(self)
         if not self.closed:  # pragma: no cover
             self.closed = True
             await self.send(b'', self.CLOSE)
 
+    def _abort(self):
+        self.closed = True
+        writer = self.request.sock[1]
+        transport = getattr(writer, 'transport', None)
+        if transport is not None:
+            # close immediately, without waiting for buffered data
+            transport.abort()
+        else:  # pragma: no cover
+            asyncio.create_task(writer.aclose())
+
+    async def _write(self, frame):
+        # frames can be sent by the handler and by a broadcast hub at the
+        # same time, so writes are serialized to keep frames whole
+        async with self.write_lock:
+            await self.request.sock[1].awrite(frame)
+
+    async def _write_frame(self, opcode, payload, fin=True, rsv1=False):
+        # the caller must hold the write lock
+        if isinstance(payload, str):
+            payload = payload.encode()
+        view = self.frame_buffer
+        if view is None or (len(view) < len(payload) + 10 and
+                            len(view) < self.frame_buffer_size):
+            # the buffer grows to fit the frames that are sent, up to
+            # frame_buffer_size
+            view = self.frame_buffer = memoryview(bytearray(
+                max(min(len(payload) + 10, self.frame_buffer_size), 10)))
+        n = self._encode_frame_header(view, opcode, len(payload), fin, rsv1)
+        size = n + len(payload)
+        self.sent_wire_bytes += size
+        writer = self.request.sock[1]
+        if size <= len(view):
+            # frames that fit in the buffer are sent with a single write
+            view[n:size] = payload
+            await writer.awrite(view[:size])
+        else:
+            # the buffer is filled with the header and the start of the
+            # payload, and the rest of the payload is written from the
+            # original object
+            payload = memoryview(payload)
+            m = len(view) - n
+            view[n:] = payload[:m]
+            writer.write(view)
+            await writer.awrite(payload[m:])
+        transport = getattr(writer, 'transport', None)
+        if transport is not None and transport.get_write_buffer_size():
+            # the transport could not send everything right away, and it may
+            # be holding a reference to the buffer until it does
+            self.frame_buffer = None
+
     def _handshake_response(self):
         connection = False
         upgrade = False
@@ -99,19 +391,95 @@ class WebSocket:
         d.update(b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11')
         return binascii.b2a_base64(d.digest())[:-1]
 
+    def _negotiate_compression(self):
+        if not self.compression or zlib is None or \
+                not hasattr(zlib, 'compressobj'):
+            return None
+        offers = self.request.headers.get('Sec-WebSocket-Extensions')
+        if not offers:
+            return None
+        for offer in offers.split(','):
+            params = [p.strip() for p in offer.split(';')]
+            if params[0] != 'permessage-deflate':
+                continue
+            server_takeover = client_takeover = \
+                self.compression_context_takeover
+            wbits = 15
+            accepted = True
+            response = ['permessage-deflate']
+            for param in params[1:]:
+                name, _, value = param.partition('=')
+                name = name.strip()
+                value = value.strip().strip('"')
+                if name == 'server_no_context_takeover':
+                    server_takeover = False
+                elif name == 'client_no_context_takeover':
+                    client_takeover = False
+                elif name == 'server_max_window_bits':
+                    # zlib does not support raw deflate with 8-bit windows
+                    try:
+                        wbits = int(value)
+                    except ValueError:
+                        accepted = False
+                    if not 9 <= wbits <= 15:
+                        accepted = False
+                    response.append('server_max_window_bits=' + str(wbits))
+                elif name != 'client_max_window_bits':
+                    accepted = False
+            if not accepted:
+                continue
+            if not server_takeover:
+                response.append('server_no_context_takeover')
+            if not client_takeover:
+                response.append('client_no_context_takeover')
+            self.compressed = True
+            self.server_takeover = server_takeover
+            self.client_takeover = client_takeover
+            self.server_wbits = wbits
+            return '; '.join(response)
+        return None
+
+    def _compress(self, data):
+        compressor = self.compressor or zlib.compressobj(
+            self.compression_level, zlib.DEFLATED, -self.server_wbits)
+        data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.compressor = compressor if self.server_takeover else None
+        # the empty block added by the sync flush is not sent
+        return data[:-4] if data.endswith(b'\x00\x00\xff\xff') else data
+
+    def _decompress(self, data, final=True, limit=True):
+        if not self.compressed:  # pragma: no cover
+            raise WebSocketError('Unexpected compressed message')
+        decompressor = self.decompressor or zlib.decompressobj(-15)
+        self.decompressor = decompressor
+        if final:
+            data += b'\x00\x00\xff\xff'
+        max_length = self._max_message_length() if limit else 0
+        try:
+            data = decompressor.decompress(data, max_length + 1) \
+                if max_length else decompressor.decompress(data)
+        except zlib.error:
+            raise WebSocketError('Invalid compressed message')
+        if max_length and len(data) > max_length:
+            raise WebSocketError('Message too large')
+        if final and not self.client_takeover:
+            self.decompressor = None
+        return data
+
     @classmethod
     def _parse_frame_header(cls, header):
         fin = header[0] & 0x80
+        rsv1 = header[0] & 0x40
         opcode = header[0] & 0x0f
-        if fin == 0 or opcode == cls.CONT:  # pragma: no cover
-            raise WebSocketError('Continuation frames not supported')
+        if fin == 0 and opcode >= cls.CLOSE:  # pragma: no cover
+            raise WebSocketError('Fragmented control frame')
         has_mask = header[1] & 0x80
         length = header[1] & 0x7f
         if length == 126:
             length = -2
         elif length == 127:
             length = -8
-        return fin, opcode, has_mask, length
+        return fin, opcode, has_mask, length, rsv1
 
     def _process_websocket_frame(self, opcode, payload):
         if opcode == self.TEXT:
@@ -126,44 +494,427 @@ class WebSocket:
             return None, None
         return None, payload
 
+    async def _process_control_frame(self, opcode, payload):
+        send_opcode, data = self._process_websocket_frame(opcode, payload)
+        if send_opcode:  # pragma: no cover
+            await self.send(data, send_opcode)
+
+    @staticmethod
+    def _encode_frame_header(buffer, opcode, length, fin=True, rsv1=False):
+        buffer[0] = (0x80 if fin else 0) | (0x40 if rsv1 else 0) | opcode
+        if length < 126:
+            buffer[1] = length
+            return 2
+        elif length < (1 << 16):
+            buffer[1] = 126
+            buffer[2] = length >> 8
+            buffer[3] = length & 0xff
+            return 4
+        buffer[1] = 127
+        for i in range(9, 1, -1):
+            buffer[i] = length & 0xff
+            length >>= 8
+        return 10
+
     @classmethod
-    def _encode_websocket_frame(cls, opcode, payload):
-        frame = bytearray()
-        frame.append(0x80 | opcode)
-        if opcode == cls.TEXT:
+    def _encode_websocket_frame(cls, opcode, payload, fin=True, rsv1=False):
+        if isinstance(payload, str):
             payload = payload.encode()
-        if len(payload) < 126:
-            frame.append(len(payload))
-        elif len(payload) < (1 << 16):
-            frame.append(126)
-            frame.extend(len(payload).to_bytes(2, 'big'))
-        else:
-            frame.append(127)
-            frame.extend(len(payload).to_bytes(8, 'big'))
+        header = bytearray(10)
+        frame = header[:cls._encode_frame_header(header, opcode,
+                                                 len(payload), fin, rsv1)]
         frame.extend(payload)
         return frame
 
-    async def _read_frame(self):
-        header = await self.request.sock[0].read(2)
+    async def _readexactly(self, n):
+        if not self.unread:
+            return await self.request.sock[0].readexactly(n)
+        data = self.unread[:n]
+        self.unread = self.unread[n:]
+        if len(data) < n:  # pragma: no cover
+            data += await self.request.sock[0].readexactly(n - len(data))
+        return data
+
+    async def _read_frame_header(self):
+        if self.unread:
+            header = await self._readexactly(2)
+        else:
+            header = await self.request.sock[0].read(2)
         if len(header) != 2:  # pragma: no cover
             raise WebSocketError('Websocket connection closed')
-        fin, opcode, has_mask, length = self._parse_frame_header(header)
+        # any frame from the client shows that the connection is alive
+        self.ping_sent = None
+        fin, opcode, has_mask, length, rsv1 = self._parse_frame_header(
+            header)
         if length == -2:
-            length = await self.request.sock[0].readexactly(2)
+            length = await self._readexactly(2)
             length = int.from_bytes(length, 'big')
         elif length == -8:
-            length = await self.request.sock[0].readexactly(8)
+            length = await self._readexactly(8)
             length = int.from_bytes(length, 'big')
-        max_allowed_length = Request.max_body_length \
-            if self.max_message_length == -1 else self.max_message_length
-        if length > max_allowed_length:
-            raise WebSocketError('Message too large')
-        if has_mask:  # pragma: no cover
-            mask = await self.request.sock[0].readexactly(4)
-        payload = await self.request.sock[0].readexactly(length)
+        mask = None
         if has_mask:  # pragma: no cover
-            payload = bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
-        return opcode, payload
+            mask = await self._readexactly(4)
+        return fin, opcode, length, mask, rsv1
+
+    async def _read_control_frames(self):
+        # the heartbeat calls this method to see the response to a ping when
+        # the application is not reading from the connection; the messages
+        # for the application that arrive first are kept as received, to be
+        # read later
+        reader = self.request.sock[0]
+        max_unread = self._max_message_length() or Request.max_body_length
+        async with self.read_lock:
+            while self.ping_sent is not None:
+                frame = await reader.readexactly(2)
+                fin, opcode, has_mask, length, rsv1 = \
+                    self._parse_frame_header(frame)
+                if length < 0:
+                    frame += await reader.readexactly(-length)
+                    length = int.from_bytes(frame[2:], 'big')
+                mask = None
+                if has_mask:  # pragma: no branch
+                    mask = await reader.readexactly(4)
+                    frame += mask
+                if opcode < self.CLOSE:
+                    if len(self.unread) + len(frame) + length > max_unread:
+                        # the client is sending more data than can be kept,
+                        # so reading stops and the data is taken as a sign
+                        # that the connection is alive
+                        self.unread += frame
+                        self.ping_sent = None
+                        break
+                    self.unread += frame + await reader.readexactly(length)
+                    continue
+                payload = await reader.readexactly(length)
+                if mask:  # pragma: no branch
+                    payload = self._unmask(payload, mask)
+                if opcode == self.PONG:
+                    self.ping_sent = None
+                elif opcode == self.PING:
+                    await self.send(payload, self.PONG)
+                else:
+                    # the client closed the connection
+                    await self.close()
+                    self._abort()
+                    break
+
+    async def _read_payload(self, length, mask):
+        payload = await self._readexactly(length)
+        if mask:  # pragma: no cover
+            payload = self._unmask(payload, mask)
+        return payload
+
+    def _max_message_length(self):
+        return Request.max_body_length if self.max_message_length == -1 \
+            else self.max_message_length
+
+    async def _read_frame(self, received=0):
+        fin, opcode, length, mask, rsv1 = await self._read_frame_header()
+        max_allowed_length = self._max_message_length()
+        if max_allowed_length and received + length > max_allowed_length:
+            raise WebSocketError('Message too large')
+        return fin, opcode, await self._read_payload(length, mask), rsv1
+
+    @staticmethod
+    def _unmask(payload, mask):
+        if viper_unmask is not None:  # pragma: no cover
+            payload = bytearray(payload)
+            viper_unmask(payload, mask)
+            return bytes(payload)
+        # the payload and the repeated mask are XORed as two big integers,
+        # which processes the whole payload in C instead of byte by byte
+        n = len(payload)
+        if n == 0:
+            return b''
+        mask = mask * (n >> 2) + mask[:n & 3]
+        return (int.from_bytes(payload, 'big') ^
+                int.from_bytes(mask, 'big')).to_bytes(n, 'big')
+
+
+class WebSocketMessage:
+    """A message that is received in chunks.
+
+    Objects of this class are returned by :meth:`WebSocket.receive_stream`.
+    They are asynchronous iterators that return the payload of the message.
+    """
+    def __init__(self, ws, fin, opcode, length, mask, chunk_size,
+                 compressed=False):
+        self.ws = ws
+        #: The opcode of the message, ``WebSocket.TEXT`` or
+        #: ``WebSocket.BINARY``.
+        self.opcode = opcode
+        self.fin = fin
+        self.remaining = length
+        self.mask = mask
+        self.offset = 0
+        self.chunk_size = chunk_size
+        self.compressed = compressed
+        self.flushed = False
+        ws.streaming = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            data = await self._next_chunk()
+            if not self.compressed:
+                if data is None:
+                    raise StopAsyncIteration
+                return data
+            if data is None:
+                if self.flushed:
+                    raise StopAsyncIteration
+                data = b''
+            last = self.remaining == 0 and self.fin
+            self.flushed = last
+            data = self.ws._decompress(data, last, limit=False)
+            if data or last:
+                return data
+
+    async def _next_chunk(self):
+        while self.remaining == 0:
+            if self.fin:
+                self.ws.streaming = False
+                return None
+            # move on to the next frame of the message, handling any control
+            # frames sent in between
+            fin, opcode, length, mask, _ = \
+                await self.ws._read_frame_header()
+            if opcode >= WebSocket.CLOSE:
+                await self.ws._process_control_frame(
+                    opcode, await self.ws._read_payload(length, mask))
+                continue
+            if opcode != WebSocket.CONT:  # pragma: no cover
+                raise WebSocketError('Expected continuation frame')
+            self.fin = fin
+            self.remaining = length
+            self.mask = mask
+            self.offset = 0
+        n = min(self.remaining, self.chunk_size)
+        data = await self.ws._readexactly(n)
+        if self.mask:  # pragma: no cover
+            i = self.offset & 3
+            data = WebSocket._unmask(data, self.mask[i:] + self.mask[:i])
+        self.offset += n
+        self.remaining -= n
+        return data
+
+
+class WebSocketHub:
+    """Broadcast messages to a group of WebSocket connections.
+
+    :param max_queue: The maximum number of messages that can be waiting to
+                      be sent to each client.
+    :param policy: What to do when a message is broadcast to a client that
+                   already has ``max_queue`` messages waiting. With
+                   ``'drop_oldest'`` (the default) the oldest waiting message
+                   is discarded. With ``'disconnect'`` the connection is
+                   closed.
+
+    Each message is encoded into a WebSocket frame once, and the frame is
+    shared by all the clients. Every client has its own queue and a task that
+    sends it, so a slow client does not delay the others. Example::
+
+        hub = WebSocketHub()
+
+        @app.route('/ws')
+        @with_websocket
+        async def websocket_handler(request, ws):
+            hub.register(ws)
+            try:
+                while True:
+                    message = await ws.receive()
+                    if message == 'toggle':
+                        toggle_led()
+                        await hub.broadcast({'type': 'state',
+                                             'value': led.value()})
+            finally:
+                hub.unregister(ws)
+    """
+    DROP_OLDEST = 'drop_oldest'
+    DISCONNECT = 'disconnect'
+
+    def __init__(self, max_queue=8, policy=DROP_OLDEST):
+        if policy not in [self.DROP_OLDEST, self.DISCONNECT]:
+            raise ValueError('Invalid policy')
+        self.max_queue = max_queue
+        self.policy = policy
+        self.clients = {}
+        #: The number of messages that were discarded because a client was
+        #: too slow to receive them.
+        self.dropped = 0
+        #: The number of clients that were disconnected because they were too
+        #: slow to receive messages.
+        self.disconnected = 0
+
+    def __len__(self):
+        return len(self.clients)
+
+    def register(self, ws):
+        """Add a WebSocket connection to the hub.
+
+        :param ws: The WebSocket object.
+        """
+        if ws not in self.clients:
+            queue = []
+            event = asyncio.Event()
+            task = asyncio.create_task(self._sender(ws, queue, event))
+            self.clients[ws] = (queue, event, task)
+
+    def unregister(self, ws):
+        """Remove a WebSocket connection from the hub. Messages that are
+        waiting to be sent to this connection are discarded.
+
+        :param ws: The WebSocket object.
+        """
+        client = self.clients.pop(ws, None)
+        if client:
+            client[2].cancel()
+
+    async def broadcast(self, data, opcode=None):
+        """Send a message to all the connections in the hub.
+
+        :param data: The data to send, given as a string, bytes, dictionary
+                     or list. Dictionaries and lists are serialized to JSON
+                     and sent as text.
+        :param opcode: A custom frame opcode to use. If not given, the opcode
+                       is ``TEXT`` or ``BINARY`` depending on the type of the
+                       data.
+
+        This method does not wait for the message to be sent.
+        """
+        if isinstance(data, (dict, list)):
+            data = Response.json_serializer(data)
+            opcode = opcode or WebSocket.TEXT
+        frame = bytes(WebSocket._encode_websocket_frame(
+            opcode or (WebSocket.TEXT if isinstance(data, str)
+                       else WebSocket.BINARY), data))
+        for ws, (queue, event, _) in list(self.clients.items()):
+            if len(queue) >= self.max_queue:
+                if self.policy == self.DISCONNECT:
+                    self.disconnected += 1
+                    self._disconnect(ws)
+                    continue
+                queue.pop(0)
+                self.dropped += 1
+            queue.append(frame)
+            event.set()
+
+    async def _sender(self, ws, queue, event):
+        try:
+            while True:
+                await event.wait()
+                event.clear()
+                while queue:
+                    await ws._write(queue.pop(0))
+        except Exception:
+            # the connection was closed
+            if self.clients.get(ws, (None, None, None))[0] is queue:
+                del self.clients[ws]
+
+    def _disconnect(self, ws):
+        self.unregister(ws)
+        ws._abort()
+
+
+class WebSocketHeartbeat:
+    """Send pings to WebSocket connections and close the ones that do not
+    respond.
+
+    :param interval: The number of seconds between pings.
+    :param timeout: The number of seconds to wait for a response to a ping
+                    before the connection is considered dead and closed.
+
+    All the connections share a single task, which runs while there are
+    connections to monitor. When the handler is reading from the connection,
+    any frame received from the client counts as a response. When it is not,
+    as in handlers that only send data, the heartbeat reads the response
+    itself, and keeps any messages that arrive before it for the handler to
+    read later. Example::
+
+        WebSocket.heartbeat = WebSocketHeartbeat(interval=20, timeout=10)
+
+        @app.route('/stats')
+        async def stats(request):
+            return {'live': WebSocket.heartbeat.live,
+                    'dead': WebSocket.heartbeat.dead}
+    """
+    def __init__(self, interval=20, timeout=10):
+        self.interval = interval
+        self.timeout = timeout
+        self.sockets = set()
+        self.task = None
+        #: The number of connections that were closed because they did not
+        #: respond to a ping.
+        self.dead = 0
+        self.ping_frame = bytes(
+            WebSocket._encode_websocket_frame(WebSocket.PING, b''))
+
+    @property
+    def live(self):
+        """The number of connections that are monitored."""
+        return len(self.sockets)
+
+    def register(self, ws):
+        """Start monitoring a WebSocket connection. Connections are
+        registered automatically when ``WebSocket.heartbeat`` is set.
+
+        :param ws: The WebSocket object.
+        """
+        ws.last_ping = ticks_ms()
+        self.sockets.add(ws)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def unregister(self, ws):
+        """Stop monitoring a WebSocket connection.
+
+        :param ws: The WebSocket object.
+        """
+        self.sockets.discard(ws)
+
+    async def _run(self):
+        try:
+            while self.sockets:
+                await asyncio.sleep(min(self.interval, self.timeout) / 2)
+                await self._check()
+        finally:
+            self.task = None
+
+    async def _check(self):
+        now = ticks_ms()
+        pings = []
+        for ws in list(self.sockets):
+            if ws.closed:
+                self.sockets.discard(ws)
+            elif ws.ping_sent is not None:
+                if ticks_diff(now, ws.ping_sent) >= self.timeout * 1000:
+                    self.dead += 1
+                    self.sockets.discard(ws)
+                    ws._abort()
+            elif ticks_diff(now, ws.last_ping) >= self.interval * 1000 and \
+                    not ws.write_lock.locked():
+                # connections that are busy sending are pinged later
+                ws.ping_sent = ws.last_ping = now
+                pings.append(self._ping(ws))
+        if pings:
+            # the pings are sent concurrently so that a connection that is
+            # slow to accept data does not delay the others
+            await asyncio.gather(*pings)
+
+    async def _ping(self, ws):
+        try:
+            await Request._wait_for(ws._write(self.ping_frame), self.timeout)
+            if not ws.read_lock.locked() and not ws.streaming:
+                # the handler is not reading from the connection
+                await Request._wait_for(ws._read_control_frames(),
+                                        self.timeout)
+        except Exception:
+            self.dead += 1
+            self.sockets.discard(ws)
+            ws._abort()
 
 
 async def websocket_upgrade(request):
@@ -199,7 +950,10 @@ def websocket_wrapper(f, upgrade_function):
         try:
             await f(request, ws, *args, **kwargs)
         except OSError as exc:
-            if exc.errno not in MUTED_SOCKET_ERRORS:  # pragma: no cover
+            # connections closed by the client, the heartbeat or a hub fail
+            # with errors that depend on the platform
+            if exc.errno not in MUTED_SOCKET_ERRORS and not ws.closed and \
+                    exc.args[0] != 'Connection lost':  # pragma: no cover
                 raise
         except WebSocketError:
             pass
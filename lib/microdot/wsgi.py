@@ -110,7 +110,7 @@ class Microdot(BaseMicrodot):
                 else:
                     raise
 
-        reason = res.reason or ('OK' if res.status_code == 200 else 'N/A')
+        reason = res.reason or res.reasons.get(res.status_code, 'N/A')
         header_list = []
         for name, value in res.headers.items():
             if not isinstance(value, list):